@@ -0,0 +1,395 @@
+"""
+Online backups
+Full snapshots copy the database inside one DuckDB transaction into a new
+.db file, so they are consistent while reads and writes continue. Incremental
+backups export only the tables changed since the previous backup (by catalog
+version, verified with row count and a content fingerprint) to zstd Parquet.
+Every backup has a manifest saying where each table's data lives, so any
+backup can be materialized into a restorable .db.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import duckdb
+
+from bloom_index import sample_fingerprint
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def list_tables(cursor, database):
+    """{table_name: None} for every table of a database"""
+    safe_database = database.replace("'", "''")
+    return {name: None for (name,) in cursor.execute(
+        "SELECT table_name FROM duckdb_tables() "
+        f"WHERE database_name = '{safe_database}' AND schema_name = 'main' AND NOT temporary"
+    ).fetchall()}
+
+
+def copy_database(conn, target_path, describe=list_tables, alias="backup_snapshot"):
+    """Copy tables into a new .db file in one transaction, consistent while reads and writes continue
+
+    describe(cursor, database) runs inside the transaction and returns {table_name: info} for
+    the tables to copy; that dict is returned. The file is removed if the copy fails. Copies
+    that may run at the same time need different aliases (attachments are per database).
+    """
+    cursor = conn.cursor()
+    try:
+        database = cursor.execute("SELECT current_database()").fetchone()[0]
+        try:
+            # Fold the WAL into the database file first; skipped while other writes are running
+            cursor.execute("CHECKPOINT")
+        except Exception as e:
+            print(f"[BACKUP] Checkpoint skipped: {str(e)}")
+        sanitized_path = target_path.replace('\\', '/')
+        cursor.execute(f"ATTACH '{sanitized_path}' AS {alias}")
+        try:
+            # One transaction: every table is read at the same MVCC snapshot
+            cursor.execute("BEGIN TRANSACTION")
+            tables = describe(cursor, database)
+            for table_name in tables:
+                cursor.execute(f'CREATE TABLE {alias}."{table_name}" AS SELECT * FROM "{database}"."{table_name}"')
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.execute(f"DETACH {alias}")
+    except Exception:
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        raise
+    finally:
+        cursor.close()
+    return tables
+
+
+def copy_tables(conn, target_paths, alias="table_copy"):
+    """Copy tables into new .db files, one per table and one transaction each
+
+    target_paths: {table_name: path}. DuckDB lets a transaction write to one attached
+    database only, so each table is consistent on its own but tables may be read at
+    slightly different moments. Returns the names copied (a table dropped meanwhile is not).
+    """
+    copied = []
+    for table_name, path in target_paths.items():
+        def describe(cursor, database, table_name=table_name):
+            return {table_name: None} if table_name in list_tables(cursor, database) else {}
+        if copy_database(conn, path, describe, alias):
+            copied.append(table_name)
+        elif os.path.exists(path):
+            os.remove(path)
+    return copied
+
+
+class BackupManager:
+    def __init__(self, backup_dir, catalog, keep_full=5, max_age_days=None, connect=duckdb.connect):
+        self.backup_dir = backup_dir
+        self.catalog = catalog
+        # Opens databases materialize() builds (the server passes its resource-profiled connect)
+        self.connect = connect
+        self.keep_full = keep_full
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        os.makedirs(backup_dir, exist_ok=True)
+
+    # Manifests
+
+    def _manifest_path(self, backup_id):
+        return os.path.join(self.backup_dir, backup_id + MANIFEST_SUFFIX)
+
+    def _data_path(self, manifest):
+        if manifest["type"] == "full":
+            return os.path.join(self.backup_dir, manifest["id"] + ".db")
+        return os.path.join(self.backup_dir, manifest["id"])
+
+    def load(self, backup_id):
+        path = self._manifest_path(backup_id)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def list(self):
+        """Backup manifests, oldest first"""
+        manifests = []
+        for filename in os.listdir(self.backup_dir):
+            if filename.endswith(MANIFEST_SUFFIX):
+                manifest = self.load(filename[:-len(MANIFEST_SUFFIX)])
+                if manifest is not None:
+                    manifests.append(manifest)
+        return sorted(manifests, key=lambda m: m["created"])
+
+    def _save(self, manifest):
+        path = self._manifest_path(manifest["id"])
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)  # a backup only exists once its manifest does
+
+    @staticmethod
+    def _new_id(kind):
+        return f"gigasheet_{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+    # Table state
+
+    def _table_states(self, cursor, database, version_of):
+        """Shape and fingerprint of every table, read inside the backup transaction
+
+        Versions come from a catalog snapshot taken before the transaction began, so a
+        write racing the backup can only make the recorded version older, never newer.
+        """
+        states = {}
+        tables = cursor.execute(
+            "SELECT table_name FROM duckdb_tables() WHERE database_name = ? AND schema_name = 'main' AND NOT temporary",
+            [database]
+        ).fetchall()
+        for (table_name,) in tables:
+            columns = [c[0] for c in cursor.execute(f'DESCRIBE "{table_name}"').fetchall()]
+            row_count = cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+            states[table_name] = {
+                "version": version_of(table_name),
+                "columns": columns,
+                "row_count": row_count,
+                "fingerprint": sample_fingerprint(cursor, f'"{table_name}"', columns, row_count)
+            }
+        return states
+
+    def _unchanged(self, previous, state, same_epoch):
+        """Catalog versions catch every API write; the fingerprint also catches outside writers"""
+        if previous is None:
+            return False
+        if same_epoch and previous["version"] != state["version"]:
+            return False
+        return (previous["columns"] == state["columns"] and previous["row_count"] == state["row_count"]
+                and previous["fingerprint"] == state["fingerprint"])
+
+    # Backups
+
+    def full(self, conn):
+        """Consistent snapshot of the whole database into backups/<id>.db"""
+        with self._lock:
+            start = time.time()
+            backup_id = self._new_id("backup")
+            snapshot_path = os.path.join(self.backup_dir, backup_id + ".db")
+            version_of = self.catalog.snapshot()
+            states = copy_database(conn, snapshot_path,
+                                   lambda cursor, database: self._table_states(cursor, database, version_of))
+
+            for state in states.values():
+                state.update({"source": backup_id, "file": None})
+            manifest = {
+                "id": backup_id,
+                "type": "full",
+                "created": time.time(),
+                "epoch": self.catalog.epoch,
+                "base": backup_id,
+                "parent": None,
+                "tables": states,
+                "changed": sorted(states),
+                "size_bytes": os.path.getsize(snapshot_path),
+                "seconds": round(time.time() - start, 3),
+                "duckdb_version": duckdb.__version__
+            }
+            self._save(manifest)
+        print(f"[BACKUP] Full snapshot {backup_id}: {len(states)} tables in {manifest['seconds']}s")
+        self.apply_retention()
+        return manifest
+
+    def incremental(self, conn):
+        """Export only tables changed since the last backup; a full snapshot if there is none yet"""
+        manifests = self.list()
+        previous = manifests[-1] if manifests else None
+        if previous is None:
+            return self.full(conn)
+
+        with self._lock:
+            start = time.time()
+            backup_id = self._new_id("incremental")
+            directory = os.path.join(self.backup_dir, backup_id)
+            os.makedirs(directory)
+            same_epoch = previous["epoch"] == self.catalog.epoch
+            cursor = conn.cursor()
+            changed = []
+            try:
+                database = cursor.execute("SELECT current_database()").fetchone()[0]
+                version_of = self.catalog.snapshot()
+                cursor.execute("BEGIN TRANSACTION")
+                try:
+                    states = self._table_states(cursor, database, version_of)
+                    for table_name, state in states.items():
+                        before = previous["tables"].get(table_name)
+                        if self._unchanged(before, state, same_epoch):
+                            state.update({"source": before["source"], "file": before["file"]})
+                            continue
+                        filename = f"{table_name}.parquet"
+                        sanitized_path = os.path.join(directory, filename).replace('\\', '/')
+                        cursor.execute(f"""
+                            COPY (SELECT * FROM "{database}"."{table_name}") TO '{sanitized_path}'
+                            (FORMAT PARQUET, COMPRESSION zstd)
+                        """)
+                        state.update({"source": backup_id, "file": filename})
+                        changed.append(table_name)
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+            except Exception:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+            finally:
+                cursor.close()
+
+            manifest = {
+                "id": backup_id,
+                "type": "incremental",
+                "created": time.time(),
+                "epoch": self.catalog.epoch,
+                "base": previous["base"],
+                "parent": previous["id"],
+                "tables": states,
+                "changed": changed,
+                "dropped": sorted(set(previous["tables"]) - set(states)),
+                "size_bytes": sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)),
+                "seconds": round(time.time() - start, 3),
+                "duckdb_version": duckdb.__version__
+            }
+            self._save(manifest)
+        print(f"[BACKUP] Incremental {backup_id}: {len(changed)} of {len(states)} tables changed in {manifest['seconds']}s")
+        self.apply_retention()
+        return manifest
+
+    def materialize(self, backup_id, output_path):
+        """Rebuild the database as of a backup into a standalone .db file"""
+        manifest = self.load(backup_id)
+        if manifest is None:
+            raise FileNotFoundError(f"Backup '{backup_id}' not found")
+        base = self.load(manifest["base"])
+        if base is None:
+            raise FileNotFoundError(f"Base snapshot '{manifest['base']}' of '{backup_id}' is missing")
+
+        shutil.copy2(self._data_path(base), output_path)  # a closed snapshot file, safe to copy
+        target = self.connect(output_path)
+        try:
+            existing = {t[0] for t in target.execute("SHOW TABLES").fetchall()}
+            for table_name in existing - set(manifest["tables"]):
+                target.execute(f'DROP TABLE "{table_name}"')
+            for table_name, entry in manifest["tables"].items():
+                if entry["source"] == base["id"]:
+                    continue
+                source = self.load(entry["source"])
+                if source is None:
+                    raise FileNotFoundError(f"Backup '{entry['source']}' holding '{table_name}' is missing")
+                parquet_path = os.path.join(self._data_path(source), entry["file"]).replace('\\', '/')
+                target.execute(f"CREATE OR REPLACE TABLE \"{table_name}\" AS SELECT * FROM read_parquet('{parquet_path}')")
+            target.execute("CHECKPOINT")
+        finally:
+            target.close()
+        return output_path
+
+    @staticmethod
+    def validate(conn, path):
+        """Attach a database file read-only and check every table is readable; returns {table: estimated rows}"""
+        cursor = conn.cursor()
+        sanitized_path = path.replace('\\', '/')
+        try:
+            cursor.execute(f"ATTACH '{sanitized_path}' AS restore_candidate (READ_ONLY)")
+        except Exception as e:
+            cursor.close()
+            raise ValueError(f"Not a readable DuckDB database: {str(e)}")
+        try:
+            tables = cursor.execute("""
+                SELECT table_name, estimated_size FROM duckdb_tables()
+                WHERE database_name = 'restore_candidate' AND schema_name = 'main'
+            """).fetchall()
+            for table_name, _ in tables:
+                cursor.execute(f'SELECT * FROM restore_candidate."{table_name}" LIMIT 1').fetchall()
+            return {table_name: estimated_size for table_name, estimated_size in tables}
+        finally:
+            cursor.execute("DETACH restore_candidate")
+            cursor.close()
+
+    def apply_retention(self, keep_full=None, max_age_days=None):
+        """Keep the newest full snapshots (and incrementals built on them); returns removed ids
+
+        Full snapshots older than max_age_days are removed too, but never the newest one.
+        """
+        keep_full = self.keep_full if keep_full is None else keep_full
+        max_age_days = self.max_age_days if max_age_days is None else max_age_days
+        with self._lock:
+            manifests = self.list()
+            fulls = [m for m in manifests if m["type"] == "full"]
+            kept = fulls[-max(1, keep_full):]
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86400
+                kept = [m for m in kept if m["created"] >= cutoff] or kept[-1:]
+            kept_bases = {m["id"] for m in kept}
+            removed = []
+            for manifest in manifests:
+                if manifest["base"] in kept_bases:
+                    continue
+                data_path = self._data_path(manifest)
+                if os.path.isdir(data_path):
+                    shutil.rmtree(data_path, ignore_errors=True)
+                elif os.path.exists(data_path):
+                    os.remove(data_path)
+                restore_point = os.path.join(self.backup_dir, f"{manifest['id']}_restore_point.db")
+                if os.path.exists(restore_point):
+                    os.remove(restore_point)
+                os.remove(self._manifest_path(manifest["id"]))
+                removed.append(manifest["id"])
+        if removed:
+            print(f"[BACKUP] Retention removed {len(removed)} backup(s)")
+        return removed
+
+
+class RestoreProgress:
+    """Phase, bytes received and per-phase timings of the running (or last) restore"""
+
+    def __init__(self):
+        self.status = "idle"
+        self.phase = None
+        self.source = None
+        self.bytes_received = 0
+        self.error = None
+        self.timings = {}
+        self.started = None
+        self._phase_started = None
+
+    def start(self, source):
+        self.status = "running"
+        self.source = source
+        self.bytes_received = 0
+        self.error = None
+        self.timings = {}
+        self.started = time.time()
+        self.enter("receiving")
+
+    def enter(self, phase):
+        now = time.time()
+        if self.phase is not None and self._phase_started is not None:
+            self.timings[self.phase] = round(now - self._phase_started, 3)
+        self.phase = phase
+        self._phase_started = now
+
+    def finish(self, error=None):
+        self.enter(None)
+        self.status = "failed" if error else "completed"
+        self.error = error
+        self.timings["total"] = round(time.time() - self.started, 3)
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "phase": self.phase,
+            "source": self.source,
+            "bytes_received": self.bytes_received,
+            "mb_received": round(self.bytes_received / (1024 * 1024), 2),
+            "phase_seconds": round(time.time() - self._phase_started, 3) if self.phase else None,
+            "timings": self.timings,
+            "error": self.error
+        }
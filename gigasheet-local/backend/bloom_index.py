@@ -0,0 +1,361 @@
+"""
+Per-block bloom filters for exact-value lookups
+One bloom filter per DuckDB row group (122,880 rows) on selected
+high-cardinality columns. Exact-match searches and filters only scan the
+row groups whose filter may contain the value.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+
+import duckdb
+import numpy as np
+
+BLOCK_ROWS = 122880  # DuckDB row group size, so skipped blocks map onto skipped row groups
+INDEXABLE_TYPES = ("VARCHAR", "BIGINT", "INTEGER", "HUGEINT", "UBIGINT", "UINTEGER")
+ID_COLUMN_HINT = re.compile(r"(^|_)(id|phone|mobile|email|mail|number|no|code|pan|aadhaar|account)($|_)", re.IGNORECASE)
+
+
+def sample_fingerprint(conn, table_name, columns, row_count):
+    """Cheap content check: hash of the given columns at 64 evenly spaced rowids"""
+    if row_count == 0:
+        return "0"
+    step = max(1, row_count // 64)
+    row_ids = ", ".join(str(r) for r in range(0, row_count, step))
+    values = ", ".join(f'CAST("{c}" AS VARCHAR)' for c in columns)
+    value = conn.execute(f"""
+        SELECT sum(hash(rowid, {values}))
+        FROM {table_name} WHERE rowid IN ({row_ids})
+    """).fetchone()[0]
+    return str(value)
+
+
+def rowid_ranges_predicate(blocks, block_rows=BLOCK_ROWS):
+    """Collapse sorted candidate block ids into rowid ranges DuckDB can push into the scan"""
+    if len(blocks) == 0:
+        return "FALSE"
+    ranges = []
+    start = prev = int(blocks[0])
+    for block in blocks[1:]:
+        block = int(block)
+        if block != prev + 1:
+            ranges.append((start, prev))
+            start = block
+        prev = block
+    ranges.append((start, prev))
+    return "(" + " OR ".join(
+        f"rowid BETWEEN {lo * block_rows} AND {(hi + 1) * block_rows - 1}"
+        for lo, hi in ranges
+    ) + ")"
+
+
+class BloomIndex:
+    def __init__(self, table_name, column, words, meta):
+        self.table_name = table_name
+        self.column = column
+        self.words = words  # (blocks, m_bits / 64) uint64 bitmap, one row per block
+        self.meta = meta
+        self.lookups = 0
+        self.blocks_checked = 0
+        self.blocks_skipped = 0
+
+    @property
+    def block_count(self):
+        return self.words.shape[0]
+
+    def candidate_blocks(self, value_hash):
+        """Boolean mask of blocks whose filter may contain the hashed value"""
+        m_bits = self.meta["m_bits"]
+        h1 = value_hash & 0xFFFFFFFF
+        h2 = (value_hash >> 32) | 1
+        mask = np.ones(self.block_count, dtype=bool)
+        for i in range(self.meta["k"]):
+            pos = (h1 + i * h2) % m_bits
+            mask &= ((self.words[:, pos // 64] >> np.uint64(pos % 64)) & np.uint64(1)) != 0
+        return mask
+
+
+class BloomIndexManager:
+    def __init__(self, index_dir, block_rows=BLOCK_ROWS, false_positive_rate=0.01, max_columns=8, read_only=False):
+        self.index_dir = index_dir
+        # Read replicas share the writer's index files: they load them but never delete them
+        self.read_only = read_only
+        self.block_rows = block_rows
+        self.false_positive_rate = false_positive_rate
+        self.max_columns = max_columns
+        self._indexes = {}
+        # table_name (None: every table) -> drops seen, so a build never outlives a write it raced
+        self._drops = {}
+        self._lock = threading.Lock()
+        self.background_builds = 0
+        self._background = {}  # running background build thread -> its cursor, for stop()
+        self._stopping = False
+        os.makedirs(index_dir, exist_ok=True)
+
+    def _paths(self, table_name, column):
+        stem = os.path.join(self.index_dir, f"{table_name}__{column}.bloom")
+        return stem + ".npy", stem + ".json"
+
+    def select_columns(self, conn, table_name):
+        """Pick high-cardinality ID-like columns from a sample of the table"""
+        columns = [(c[0], c[1]) for c in conn.execute(f"DESCRIBE {table_name}").fetchall()]
+        candidates = [name for name, col_type in columns if col_type.upper().startswith(INDEXABLE_TYPES)]
+        if not candidates:
+            return []
+        select_list = ", ".join(
+            f'approx_count_distinct("{c}"), count("{c}")' for c in candidates
+        )
+        sample = conn.execute(
+            f"SELECT {select_list} FROM {table_name} USING SAMPLE 100000 ROWS"
+        ).fetchone()
+        scored = []
+        for i, column in enumerate(candidates):
+            distinct, non_null = sample[2 * i], sample[2 * i + 1]
+            if not non_null:
+                continue
+            ratio = distinct / non_null
+            if ratio >= 0.9 or (ratio >= 0.5 and ID_COLUMN_HINT.search(column)):
+                scored.append((ratio, column))
+        return [column for _, column in sorted(scored, reverse=True)[:self.max_columns]]
+
+    def _writes(self, table_name):
+        return self._drops.get(None, 0), self._drops.get(table_name, 0)
+
+    def build_table(self, conn, table_name, columns=None):
+        """Build bloom filters for a table (auto-selecting columns if none given)"""
+        if columns is None:
+            columns = self.select_columns(conn, table_name)
+        built = []
+        for column in columns:
+            if self._stopping:
+                break
+            try:
+                meta = self.build(conn, table_name, column)
+            except Exception as e:
+                print(f"[BLOOM] Could not index {table_name}.{column}: {str(e)}")
+                continue
+            if meta is not None:
+                built.append(meta)
+        return built
+
+    def build_in_background(self, get_conn, table_names):
+        """Build bloom filters for tables off the request path (e.g. after a restore dropped them all)"""
+        def run():
+            thread = threading.current_thread()
+            try:
+                cursor = get_conn().cursor()
+                with self._lock:
+                    if self._stopping:
+                        cursor.close()
+                        return
+                    self._background[thread] = cursor
+                try:
+                    for table_name in table_names:
+                        self.build_table(cursor, table_name)
+                finally:
+                    with self._lock:
+                        self._background.pop(thread, None)
+                    cursor.close()
+            except Exception as e:
+                print(f"[BLOOM] Background indexing stopped: {str(e)}")
+
+        self.background_builds += 1
+        thread = threading.Thread(target=run, name="bloom-index", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self, timeout=5):
+        """Interrupt background builds and wait for them (at shutdown: a daemon thread still
+        inside DuckDB when the interpreter exits aborts the process)"""
+        with self._lock:
+            self._stopping = True
+            running = list(self._background.items())
+        deadline = time.perf_counter() + timeout
+        for thread, cursor in running:
+            # A build runs several statements: keep interrupting until it gives up
+            while thread.is_alive() and time.perf_counter() < deadline:
+                cursor.interrupt()
+                thread.join(0.1)
+
+    def build(self, conn, table_name, column):
+        """Build the per-block bitmap for one column entirely inside DuckDB
+
+        Returns its metadata, or None when the table was written while it was built.
+        """
+        start = time.time()
+        with self._lock:
+            drops = self._writes(table_name)
+        row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        block_count = max(1, math.ceil(row_count / self.block_rows))
+        keys_per_block = max(1, min(row_count, self.block_rows))
+        bits_per_key = -math.log(self.false_positive_rate) / (math.log(2) ** 2)
+        m_bits = math.ceil(keys_per_block * bits_per_key / 64) * 64
+        k = max(1, round(bits_per_key * math.log(2)))
+
+        # Double hashing: position i = (h1 + i * h2) mod m, one UNION ALL branch per i
+        positions = " UNION ALL ".join(
+            f"SELECT blk, ((h & 4294967295) + {i} * ((h >> 32) | 1)) % {m_bits} AS pos FROM hashed"
+            for i in range(k)
+        )
+        result = conn.execute(f"""
+            WITH hashed AS (
+                SELECT rowid // {self.block_rows} AS blk,
+                       hash(CAST("{column}" AS VARCHAR)) AS h
+                FROM {table_name}
+                WHERE "{column}" IS NOT NULL
+            ), positions AS (
+                {positions}
+            )
+            SELECT blk, pos // 64 AS word, bit_or((1::UBIGINT) << (pos % 64)) AS bits
+            FROM positions
+            GROUP BY ALL
+        """).fetchnumpy()
+
+        words = np.zeros((block_count, m_bits // 64), dtype=np.uint64)
+        words[result["blk"].astype(np.int64), result["word"].astype(np.int64)] = result["bits"].astype(np.uint64)
+
+        meta = {
+            "table_name": table_name,
+            "column": column,
+            "row_count": row_count,
+            "block_rows": self.block_rows,
+            "m_bits": m_bits,
+            "k": k,
+            "false_positive_rate": self.false_positive_rate,
+            "fingerprint": sample_fingerprint(conn, table_name, [column], row_count),
+            "duckdb_version": duckdb.__version__,
+            "built_at": time.time(),
+            "build_seconds": round(time.time() - start, 3)
+        }
+        words_path, meta_path = self._paths(table_name, column)
+        np.save(words_path, words)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        index_bytes = words.nbytes
+        del words
+
+        with self._lock:
+            current = self._writes(table_name) == drops
+            if current:
+                # Served from the file like get() does: the page cache holds it, not this
+                # process's heap (which DuckDB's memory_limit does not see)
+                self._indexes[(table_name, column)] = BloomIndex(table_name, column,
+                                                                 np.load(words_path, mmap_mode="r"), meta)
+        if not current:
+            for path in (words_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            print(f"[BLOOM] Discarded index for {table_name}.{column}: the table was written while it was built")
+            return None
+        print(f"[BLOOM] Indexed {table_name}.{column}: {block_count} blocks, "
+              f"{index_bytes / (1024 * 1024):.1f} MB in {meta['build_seconds']}s")
+        return meta
+
+    def get(self, conn, table_name, column):
+        """Loaded index for a column, or None if missing or stale"""
+        with self._lock:
+            index = self._indexes.get((table_name, column))
+        if index is not None:
+            return index
+
+        words_path, meta_path = self._paths(table_name, column)
+        if not (os.path.exists(words_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            # An index built elsewhere (e.g. merge_data_now.py) must still match the table
+            row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+            if (meta["duckdb_version"] != duckdb.__version__ or meta["row_count"] != row_count
+                    or meta["fingerprint"] != sample_fingerprint(conn, table_name, [column], row_count)):
+                print(f"[BLOOM] Ignoring stale index for {table_name}.{column}")
+                return None
+            index = BloomIndex(table_name, column, np.load(words_path, mmap_mode="r"), meta)
+        except Exception as e:
+            print(f"[BLOOM] Could not load index for {table_name}.{column}: {str(e)}")
+            return None
+
+        with self._lock:
+            self._indexes[(table_name, column)] = index
+        return index
+
+    def prune(self, conn, table_name, columns, value):
+        """Rowid predicate restricting an exact match on any of the indexed columns to candidate blocks
+
+        Returns (predicate, stats); predicate is None when no column has an index. Columns
+        without one are listed in stats["unindexed_columns"]: the caller must still match
+        them without the predicate, so blocks are only skipped when that list is empty.
+        """
+        found = {column: self.get(conn, table_name, column) for column in columns}
+        indexes = [index for index in found.values() if index is not None]
+        if not indexes:
+            return None, None
+
+        value_hash = conn.execute("SELECT hash(CAST(? AS VARCHAR))", [str(value)]).fetchone()[0]
+        mask = np.zeros(indexes[0].block_count, dtype=bool)
+        for index in indexes:
+            candidates = index.candidate_blocks(value_hash)
+            mask |= candidates
+            index.lookups += 1
+            index.blocks_checked += index.block_count
+            index.blocks_skipped += int(index.block_count - candidates.sum())
+
+        blocks_total = len(mask)
+        blocks_skipped = int(blocks_total - mask.sum())
+        stats = {
+            "columns": [column for column, index in found.items() if index is not None],
+            "unindexed_columns": [column for column, index in found.items() if index is None],
+            "blocks_total": blocks_total,
+            "blocks_skipped": blocks_skipped,
+            "skip_rate": round(blocks_skipped / blocks_total, 4) if blocks_total else 0.0
+        }
+        return rowid_ranges_predicate(np.flatnonzero(mask), self.block_rows), stats
+
+    def drop(self, table_name=None):
+        """Forget and delete indexes for a table (or all tables) after it is rewritten"""
+        with self._lock:
+            self._drops[table_name] = self._drops.get(table_name, 0) + 1
+            for key in list(self._indexes):
+                if table_name is None or key[0] == table_name:
+                    del self._indexes[key]
+        if self.read_only:
+            return
+        for filename in os.listdir(self.index_dir):
+            if filename.endswith((".bloom.npy", ".bloom.json")) and (
+                    table_name is None or filename.startswith(f"{table_name}__")):
+                try:
+                    os.remove(os.path.join(self.index_dir, filename))
+                except OSError:
+                    pass
+
+    def stats(self):
+        indexes = []
+        for filename in sorted(os.listdir(self.index_dir)):
+            if not filename.endswith(".bloom.json"):
+                continue
+            with open(os.path.join(self.index_dir, filename)) as f:
+                meta = json.load(f)
+            with self._lock:
+                loaded = self._indexes.get((meta["table_name"], meta["column"]))
+            entry = {
+                "table_name": meta["table_name"],
+                "column": meta["column"],
+                "row_count": meta["row_count"],
+                "blocks": math.ceil(meta["row_count"] / meta["block_rows"]) if meta["row_count"] else 1,
+                "size_mb": round(meta["m_bits"] / 8 * max(1, math.ceil(meta["row_count"] / meta["block_rows"])) / (1024 * 1024), 2),
+                "build_seconds": meta["build_seconds"],
+                "loaded": loaded is not None
+            }
+            if loaded is not None:
+                entry.update({
+                    "lookups": loaded.lookups,
+                    "blocks_checked": loaded.blocks_checked,
+                    "blocks_skipped": loaded.blocks_skipped,
+                    "skip_rate": round(loaded.blocks_skipped / loaded.blocks_checked, 4) if loaded.blocks_checked else 0.0
+                })
+            indexes.append(entry)
+        return {"indexes": indexes, "total_indexes": len(indexes), "background_builds": self.background_builds}
@@ -0,0 +1,135 @@
+"""
+Capacity estimator
+Predicts disk, time and memory for a target row count from what this
+machine has actually done: bytes per row of the stored tables (catalog
+stats), rows/sec of recent ingests and exports (with output bytes per row),
+and rows scanned per second, peak buffer memory and temp-directory use of
+profiled search and sort statements. DuckDB streams scans and spills sorts
+to disk, so memory is
+bounded by memory_limit rather than growing with the row count; what grows
+is time, disk and temp space.
+"""
+
+import threading
+import time
+from collections import deque
+
+WORKLOADS = ("ingest", "search", "sort", "export")
+# Profiles of statements that touched fewer rows are dominated by fixed costs
+MIN_OBSERVED_ROWS = 10000
+
+
+def _rows_sorted(node):
+    """Largest number of rows any ORDER_BY operator in the plan sorted"""
+    own = node.get("operator_cardinality", 0) if (node.get("operator_name") or node.get("operator_type")) == "ORDER_BY" else 0
+    return max([own] + [_rows_sorted(child) for child in node.get("children", [])])
+
+
+def classify(source, profile):
+    """Workload of a profiled statement, or None if it is not one we model"""
+    source = source or ""
+    if source.startswith("search"):
+        # Search orders its (small) set of matching rowids; that is not a table sort
+        return "search"
+    if _rows_sorted(profile) >= MIN_OBSERVED_ROWS:
+        return "sort"
+    if source.startswith("data_page"):
+        return "search"
+    # Exports are observed whole (query + file writing) by the export endpoint
+    return None
+
+
+class CapacityEstimator:
+    def __init__(self, catalog, history=200):
+        self.catalog = catalog
+        self._observations = {workload: deque(maxlen=history) for workload in WORKLOADS}
+        self._lock = threading.Lock()
+
+    def observe(self, workload, rows, seconds, peak_memory_bytes=None, peak_temp_bytes=None, output_bytes=None,
+                source=None):
+        if rows < MIN_OBSERVED_ROWS or seconds <= 0:
+            return
+        with self._lock:
+            self._observations[workload].append({
+                "timestamp": time.time(),
+                "source": source or workload,
+                "rows": rows,
+                "seconds": seconds,
+                "peak_memory_bytes": peak_memory_bytes,
+                "peak_temp_bytes": peak_temp_bytes,
+                "output_bytes": output_bytes
+            })
+
+    def observe_profile(self, source, sql, seconds, profile):
+        """Query log listener: record the throughput and memory of a profiled statement"""
+        workload = classify(source, profile)
+        if workload is None:
+            return
+        self.observe(workload, profile.get("cumulative_rows_scanned") or 0, profile.get("latency") or seconds,
+                     profile.get("system_peak_buffer_memory"), profile.get("system_peak_temp_dir_size"), source=source)
+
+    def observations(self, workload):
+        with self._lock:
+            return list(self._observations[workload])
+
+    def bytes_per_row(self, table_name=None):
+        """On-disk bytes per row of one table, or of all tables together"""
+        tables = [t for t in self.catalog.tables() if table_name is None or t["name"] == table_name]
+        rows = sum(t["row_count"] for t in tables)
+        size = sum(t["estimated_bytes"] for t in tables)
+        if not rows or not size:
+            return None
+        return size / rows
+
+    def _workload_estimate(self, workload, target_rows, bytes_per_row, memory_limit_bytes):
+        observed = self.observations(workload)
+        if not observed:
+            return {"observations": 0, "note": f"No {workload} measured yet; run one (or the readiness benchmark) first"}
+        rows = sum(o["rows"] for o in observed)
+        seconds = sum(o["seconds"] for o in observed)
+        rows_per_second = rows / seconds
+        estimate = {
+            "observations": len(observed),
+            "observed_rows": rows,
+            "rows_per_second": round(rows_per_second),
+            "estimated_seconds": round(target_rows / rows_per_second, 1)
+        }
+        peaks = [o["peak_memory_bytes"] for o in observed if o["peak_memory_bytes"]]
+        if peaks:
+            # Streaming operators keep a bounded working set; sorts spill once they reach the limit
+            peak = max(peaks)
+            if workload == "sort" and memory_limit_bytes:
+                peak = memory_limit_bytes
+            estimate["estimated_peak_memory_gb"] = round(peak / (1024**3), 2)
+        if workload == "sort":
+            # A sort larger than memory spills roughly its whole input to the temp directory
+            spill_ratios = [(o["peak_temp_bytes"] or 0) / o["rows"] for o in observed]
+            per_row = max(spill_ratios + [bytes_per_row or 0])
+            estimate["estimated_temp_disk_gb"] = round(per_row * target_rows / (1024**3), 2)
+        if workload == "ingest" and bytes_per_row:
+            estimate["estimated_disk_gb"] = round(bytes_per_row * target_rows / (1024**3), 2)
+        if workload == "export":
+            outputs = [o for o in observed if o["output_bytes"]]
+            if outputs:
+                per_row = sum(o["output_bytes"] for o in outputs) / sum(o["rows"] for o in outputs)
+                estimate["estimated_output_gb"] = round(per_row * target_rows / (1024**3), 2)
+        return estimate
+
+    def estimate(self, target_rows, table_name=None, memory_limit_bytes=None, disk_free_bytes=None):
+        bytes_per_row = self.bytes_per_row(table_name)
+        workloads = {workload: self._workload_estimate(workload, target_rows, bytes_per_row, memory_limit_bytes)
+                     for workload in WORKLOADS}
+        storage_gb = round(bytes_per_row * target_rows / (1024**3), 2) if bytes_per_row else None
+        needed_gb = (storage_gb or 0) + workloads["sort"].get("estimated_temp_disk_gb", 0)
+        result = {
+            "target_rows": target_rows,
+            "table_name": table_name,
+            "bytes_per_row_on_disk": round(bytes_per_row, 1) if bytes_per_row else None,
+            "estimated_storage_gb": storage_gb,
+            "workloads": workloads
+        }
+        if disk_free_bytes is not None and storage_gb is not None:
+            disk_free_gb = disk_free_bytes / (1024**3)
+            result["disk_free_gb"] = round(disk_free_gb, 2)
+            result["fits_on_disk"] = needed_gb <= disk_free_gb
+        return result
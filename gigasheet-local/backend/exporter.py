@@ -0,0 +1,418 @@
+"""
+Streaming table export
+Encodes a DuckDB result chunk by chunk straight into the HTTP response, with
+optional on-the-fly gzip/zstd, so memory stays constant and the exported
+file is never staged on the server (Parquet needs pyarrow for this; without
+it the file is spooled to a temporary file while it is sent). Excel workbooks are written row batch by
+row batch in openpyxl's write-only mode, rolling over to a new sheet at
+Excel's row limit.
+"""
+
+import datetime
+import decimal
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# openpyxl's ILLEGAL_CHARACTERS_RE; openpyxl itself is imported on the first Excel export
+ILLEGAL_CHARACTERS_RE = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+CHUNK_VECTORS = 10  # 2048-row vectors, so ~20K rows per encoded chunk
+PARQUET_BATCH_ROWS = 122880  # one Parquet row group per DuckDB row group
+PARQUET_CODECS = {None: "snappy", "gzip": "gzip", "zstd": "zstd"}
+PARQUET_MANIFEST = "manifest.json"
+EXCEL_MAX_ROWS = 1048576  # per sheet, including the header row
+EXCEL_FETCH_ROWS = 10000
+
+FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "ndjson": (".ndjson", "application/x-ndjson"),
+    "parquet": (".parquet", "application/vnd.apache.parquet")
+}
+COMPRESSIONS = {
+    "gzip": (".gz", "application/gzip"),
+    "zstd": (".zst", "application/zstd")
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+class _Compressor:
+    """Uniform compress/flush wrapper over gzip (zlib) and zstd streams"""
+
+    def __init__(self, compression):
+        if compression == "gzip":
+            self._stream = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+        else:
+            self._stream = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self._stream.compress(data)
+
+    def flush(self):
+        return self._stream.flush()
+
+
+class _ChunkSink:
+    """Write-only file object collecting Parquet output until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportStream:
+    """Iterable of encoded bytes for one query result
+
+    The query runs on its own cursor when the stream is created, so SQL errors
+    surface before the response starts; rows are fetched lazily while iterating.
+    """
+
+    def __init__(self, conn, query, format="csv", compression=None):
+        if format not in FORMATS:
+            raise ExportError(f"Unsupported export format '{format}'")
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ExportError(f"Unsupported compression '{compression}'")
+        if compression == "zstd" and format != "parquet" and not ZSTD_AVAILABLE:
+            # Parquet's zstd codec is DuckDB's / pyarrow's own; only the text streams need zstandard
+            raise ExportError("zstd compression requires the zstandard package")
+        self.format = format
+        self.compression = compression
+        self.rows = 0
+        self.bytes = 0
+        self._query = query
+        self._cursor = conn.cursor()
+        try:
+            self._cursor.execute(query)
+        except Exception:
+            self._cursor.close()
+            raise
+
+    @property
+    def extension(self):
+        extension = FORMATS[self.format][0]
+        # Parquet compresses internally, so the codec is applied per column chunk instead
+        if self.compression and self.format != "parquet":
+            extension += COMPRESSIONS[self.compression][0]
+        return extension
+
+    @property
+    def media_type(self):
+        if self.compression and self.format != "parquet":
+            return COMPRESSIONS[self.compression][1]
+        return FORMATS[self.format][1]
+
+    def filename(self, stem):
+        return f"{stem}{self.extension}"
+
+    def __iter__(self):
+        try:
+            if self.format == "parquet":
+                chunks = self._parquet_chunks()
+            else:
+                chunks = self._text_chunks()
+            compressor = _Compressor(self.compression) if self.compression and self.format != "parquet" else None
+            for chunk in chunks:
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    self.bytes += len(chunk)
+                    yield chunk
+            if compressor is not None:
+                tail = compressor.flush()
+                self.bytes += len(tail)
+                yield tail
+        finally:
+            self._cursor.close()
+
+    def _text_chunks(self):
+        first = True
+        while True:
+            df = self._cursor.fetch_df_chunk(CHUNK_VECTORS)
+            if len(df) == 0 and not first:
+                break
+            self.rows += len(df)
+            if self.format == "csv":
+                text = df.to_csv(index=False, header=first)
+            elif len(df):
+                text = df.to_json(orient="records", lines=True, date_format="iso", date_unit="us", force_ascii=False)
+                if not text.endswith("\n"):
+                    text += "\n"
+            else:
+                text = ""
+            first = False
+            yield text.encode("utf-8")
+
+    def _parquet_chunks(self):
+        codec = PARQUET_CODECS[self.compression]
+        if not PYARROW_AVAILABLE:
+            # Without pyarrow, DuckDB writes the file to a temporary spool that is removed once sent
+            yield from self._spooled_parquet(codec)
+            return
+        reader = self._cursor.fetch_record_batch(PARQUET_BATCH_ROWS)
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), reader.schema, compression=codec)
+        try:
+            for batch in reader:
+                writer.write_batch(batch)
+                self.rows += batch.num_rows
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    def _spooled_parquet(self, codec):
+        print("[EXPORT] pyarrow not installed - spooling Parquet through a temporary file")
+        fd, path = tempfile.mkstemp(suffix=".parquet")
+        os.close(fd)
+        try:
+            sanitized_path = path.replace('\\', '/')
+            self._cursor.execute(f"COPY ({self._query}) TO '{sanitized_path}' (FORMAT PARQUET, COMPRESSION {codec})")
+            self.rows = self._cursor.fetchone()[0]
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(8 * 1024 * 1024)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            os.remove(path)
+
+
+def write_parquet(conn, query, path, partition_by=None, per_thread=False, row_group_size=None,
+                  compression="snappy", compression_level=None, query_log=None):
+    """COPY a query result to Parquet inside DuckDB
+
+    With partition_by (hive layout, col=value/ directories) or per_thread
+    (one file per writer thread, written in parallel) the output is a
+    directory with a manifest of its files. Returns the manifest, or a
+    one-file summary for a plain single-file write. A query_log records the
+    COPY if it is slow.
+    """
+    start = time.time()
+    options = ["FORMAT PARQUET", f"COMPRESSION {compression}"]
+    if compression_level is not None:
+        options.append(f"COMPRESSION_LEVEL {int(compression_level)}")
+    if row_group_size:
+        options.append(f"ROW_GROUP_SIZE {int(row_group_size)}")
+    if partition_by:
+        options.append(f"PARTITION_BY ({', '.join(partition_by)})")
+    if per_thread:
+        options.append("PER_THREAD_OUTPUT TRUE")
+    sanitized_path = path.replace('\\', '/')
+    copy_sql = f"COPY ({query}) TO '{sanitized_path}' ({', '.join(options)})"
+    if query_log is not None:
+        rows = query_log.run(conn, copy_sql, source="export_parquet", fetch=lambda cursor: cursor.fetchone()[0])
+    else:
+        rows = conn.execute(copy_sql).fetchone()[0]
+    seconds = round(time.time() - start, 3)
+
+    if not (partition_by or per_thread):
+        return {"files": [{"path": os.path.basename(path), "rows": rows, "bytes": os.path.getsize(path)}],
+                "total_rows": rows, "total_bytes": os.path.getsize(path), "write_seconds": seconds}
+
+    files = []
+    # parquet_metadata has one row per column chunk, so take each row group once
+    for file_name, row_groups, file_rows in conn.execute(f"""
+        SELECT file_name, count(*), sum(num_rows) FROM (
+            SELECT file_name, row_group_id, any_value(row_group_num_rows) AS num_rows
+            FROM parquet_metadata('{sanitized_path}/**/*.parquet')
+            GROUP BY ALL
+        ) GROUP BY file_name ORDER BY file_name
+    """).fetchall():
+        relative = os.path.relpath(file_name, path).replace(os.sep, "/")
+        files.append({
+            "path": relative,
+            "partition": dict(part.split("=", 1) for part in relative.split("/")[:-1] if "=" in part),
+            "rows": int(file_rows),
+            "row_groups": row_groups,
+            "bytes": os.path.getsize(file_name)
+        })
+    manifest = {
+        "format": "parquet",
+        "layout": "hive" if partition_by else "per_thread",
+        "partition_by": list(partition_by or []),
+        "per_thread_output": bool(per_thread),
+        "compression": compression,
+        "compression_level": compression_level,
+        "row_group_size": row_group_size,
+        "files": files,
+        "total_files": len(files),
+        "total_rows": rows,
+        "total_bytes": sum(f["bytes"] for f in files),
+        "write_seconds": seconds,
+        "created": time.time()
+    }
+    with open(os.path.join(path, PARQUET_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class ExportJob:
+    def __init__(self, job_id, table_name, format, filename, total_rows):
+        self.job_id = job_id
+        self.table_name = table_name
+        self.format = format
+        self.filename = filename
+        self.total_rows = total_rows
+        self.rows_written = 0
+        self.sheets = 0
+        self.status = "running"
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        elapsed = (self.finished or time.time()) - self.started
+        return {
+            "job_id": self.job_id,
+            "table_name": self.table_name,
+            "format": self.format,
+            "filename": self.filename,
+            "status": self.status,
+            "rows_written": self.rows_written,
+            "total_rows": self.total_rows,
+            "percent": round(100 * self.rows_written / self.total_rows, 1) if self.total_rows else 100.0,
+            "sheets": self.sheets,
+            "rows_per_second": round(self.rows_written / elapsed) if elapsed > 0 else 0,
+            "elapsed_seconds": round(elapsed, 1),
+            "error": self.error
+        }
+
+
+class ExportJobs:
+    """Progress of running and recent file exports, for polling while an export runs"""
+
+    def __init__(self, max_finished=20):
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def start(self, table_name, format, filename, total_rows):
+        with self._lock:
+            job = ExportJob(self._next_id, table_name, format, filename, total_rows)
+            self._jobs[job.job_id] = job
+            self._next_id += 1
+            finished = [j for j in self._jobs.values() if j.status != "running"]
+            for old in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[old.job_id]
+        return job
+
+    def finish(self, job, error=None):
+        job.status = "failed" if error else "completed"
+        job.error = error
+        job.finished = time.time()
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in reversed(list(self._jobs.values()))]
+
+    def running(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == "running")
+
+
+def _excel_value(value):
+    """Map DuckDB values to types openpyxl can store"""
+    if value is None or isinstance(value, (bool, int, float, decimal.Decimal)):
+        return value
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    if isinstance(value, (datetime.datetime, datetime.time)):
+        # Excel has no time zones
+        return value.replace(tzinfo=None)
+    if isinstance(value, (datetime.date, datetime.timedelta)):
+        return value
+    return str(value)
+
+
+def write_excel(conn, query, filepath, job=None, max_sheet_rows=EXCEL_MAX_ROWS, fetch_rows=EXCEL_FETCH_ROWS,
+                query_log=None):
+    """Write a query result to .xlsx in constant memory
+
+    Rows are fetched in batches and appended to a write-only workbook; a new
+    sheet with the header repeated starts whenever a sheet is full.
+    Returns (rows_written, sheets). A query_log records the query (timed
+    until its last row is fetched) if it is slow.
+    """
+    from openpyxl import Workbook
+
+    cursor = query_log.cursor(conn) if query_log is not None else conn.cursor()
+    tracking = query_log.track(cursor, query, source="export_excel") if query_log is not None else nullcontext()
+    try:
+        with tracking:
+            cursor.execute(query)
+            header = [desc[0] for desc in cursor.description]
+            workbook = Workbook(write_only=True)
+            sheet = None
+            sheet_rows = 0
+            sheets = 0
+            rows_written = 0
+            while True:
+                batch = cursor.fetchmany(fetch_rows)
+                if not batch and sheet is not None:
+                    break
+                if sheet is None:
+                    # Header-only sheet for an empty result
+                    sheets += 1
+                    sheet = workbook.create_sheet(f"Sheet{sheets}")
+                    sheet.append(header)
+                    sheet_rows = 1
+                for row in batch:
+                    if sheet_rows >= max_sheet_rows:
+                        sheets += 1
+                        sheet = workbook.create_sheet(f"Sheet{sheets}")
+                        sheet.append(header)
+                        sheet_rows = 1
+                    sheet.append([_excel_value(v) for v in row])
+                    sheet_rows += 1
+                rows_written += len(batch)
+                if job is not None:
+                    job.rows_written = rows_written
+                    job.sheets = sheets
+        workbook.save(filepath)
+        return rows_written, sheets
+    finally:
+        cursor.close()
@@ -0,0 +1,355 @@
+"""
+Fuzzy (typo-tolerant) search index
+A vocabulary of the distinct tokens in a table's text columns, with the row
+groups each token appears in and its character trigrams. A fuzzy query is
+blocked by shared trigrams and token length before levenshtein() runs, and
+only the row groups containing a matching token are scanned.
+"""
+
+import re
+import threading
+import time
+
+from bloom_index import BLOCK_ROWS, rowid_ranges_predicate, sample_fingerprint
+
+TOKEN_SPLIT_SQL = r"[^\p{L}\p{N}]+"
+TOKEN_SPLIT = re.compile(r"[\W_]+")
+MIN_TOKEN_LENGTH = 3
+# Most vocabulary tokens levenshtein() is run on per query token, however loose the blocking
+MAX_VERIFIED = 20000
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def token_pattern(tokens):
+    """Regex matching any of the tokens as a whole token (tokens are letters/digits only)"""
+    alternatives = "|".join(re.escape(t) for t in tokens)
+    return f"(^|[^\\p{{L}}\\p{{N}}])({alternatives})([^\\p{{L}}\\p{{N}}]|$)"
+
+
+def default_distance(token):
+    """Edit distance allowed for a query token when none is requested"""
+    return 1 if len(token) <= 5 else 2
+
+
+class FuzzyIndexManager:
+    def __init__(self, index_path, block_rows=BLOCK_ROWS, max_candidates=50, max_verified=MAX_VERIFIED):
+        self.index_path = index_path
+        self.block_rows = block_rows
+        self.max_candidates = max_candidates
+        self.max_verified = max_verified
+        self._lock = threading.Lock()  # builds and index metadata
+        self._state_lock = threading.Lock()  # the bookkeeping below; never held during a query
+        self._validated = {}  # table_name -> indexed text columns, current in this process
+        self._stale = set()
+        # table_name (None: every table) -> writes seen, so a build never clears staleness from a later write
+        self._drops = {}
+        self.background_builds = 0
+        self._background = {}  # running background build thread -> its cursor, for stop()
+        self._stopping = False
+        self.lookups = 0
+        self.tokens_verified = 0
+
+    def _attach(self, conn):
+        attached = conn.execute(
+            "SELECT count(*) FROM duckdb_databases() WHERE database_name = 'fuzzy_index'"
+        ).fetchone()[0]
+        if not attached:
+            sanitized_path = self.index_path.replace('\\', '/')
+            conn.execute(f"ATTACH '{sanitized_path}' AS fuzzy_index")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fuzzy_index.meta (
+                    table_name VARCHAR PRIMARY KEY,
+                    columns VARCHAR,
+                    row_count BIGINT,
+                    fingerprint VARCHAR,
+                    tokens BIGINT,
+                    built_at DOUBLE,
+                    build_seconds DOUBLE
+                )
+            """)
+
+    @staticmethod
+    def text_columns(conn, table_name):
+        return [c[0] for c in conn.execute(f"DESCRIBE {table_name}").fetchall()
+                if c[1].upper() == "VARCHAR"]
+
+    def build(self, conn, table_name):
+        """Build the token vocabulary (with row groups) and its trigram blocking table"""
+        with self._lock:
+            return self._build(conn, table_name)
+
+    def _build(self, conn, table_name):
+        start = time.time()
+        with self._state_lock:
+            drops = self._writes(table_name)
+        self._attach(conn)
+        columns = self.text_columns(conn, table_name)
+        row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        vocab, grams = f'fuzzy_index."v_{table_name}"', f'fuzzy_index."g_{table_name}"'
+        if not columns:
+            conn.execute(f"DROP TABLE IF EXISTS {vocab}")
+            conn.execute(f"DROP TABLE IF EXISTS {grams}")
+            tokens = 0
+        else:
+            token_sources = " UNION ALL ".join(
+                f"""SELECT rowid // {self.block_rows} AS blk,
+                           unnest(regexp_split_to_array(lower("{c}"), '{TOKEN_SPLIT_SQL}')) AS tok
+                    FROM {table_name}"""
+                for c in columns
+            )
+            conn.execute(f"""
+                CREATE OR REPLACE TABLE {vocab} AS
+                SELECT tok AS token, length(tok) AS len, list(DISTINCT blk ORDER BY blk) AS blocks
+                FROM ({token_sources})
+                WHERE length(tok) >= {MIN_TOKEN_LENGTH}
+                GROUP BY tok
+            """)
+            conn.execute(f"""
+                CREATE OR REPLACE TABLE {grams} AS
+                SELECT token, unnest(list_distinct(
+                    [substr('$' || token || '$', i, 3) for i in range(1, len + 1)]
+                )) AS gram
+                FROM {vocab}
+            """)
+            tokens = conn.execute(f"SELECT COUNT(*) FROM {vocab}").fetchone()[0]
+
+        build_seconds = round(time.time() - start, 3)
+        conn.execute("DELETE FROM fuzzy_index.meta WHERE table_name = ?", [table_name])
+        conn.execute("INSERT INTO fuzzy_index.meta VALUES (?, ?, ?, ?, ?, ?, ?)", [
+            table_name, ",".join(columns), row_count,
+            sample_fingerprint(conn, table_name, columns, row_count) if columns else "0",
+            tokens, time.time(), build_seconds
+        ])
+        with self._state_lock:
+            if self._writes(table_name) == drops:
+                self._validated[table_name] = columns
+                self._stale.discard(table_name)
+        print(f"[FUZZY] Indexed {table_name}: {tokens:,} tokens from {len(columns)} text columns in {build_seconds}s")
+        return {"table_name": table_name, "columns": columns, "tokens": tokens, "build_seconds": build_seconds}
+
+    def _writes(self, table_name):
+        return self._drops.get(None, 0), self._drops.get(table_name, 0)
+
+    def _current(self, table_name):
+        with self._state_lock:
+            if table_name in self._validated and table_name not in self._stale:
+                return self._validated[table_name]
+            return None
+
+    def ensure(self, conn, table_name):
+        """Indexed text columns for a table, (re)building the vocabulary if missing or stale"""
+        columns = self._current(table_name)
+        if columns is not None:
+            return columns
+        with self._lock:
+            # A build (in the background or for another request) may have finished while we waited
+            columns = self._current(table_name)
+            if columns is not None:
+                return columns
+            with self._state_lock:
+                drops = self._writes(table_name)
+                stale = table_name in self._stale
+            self._attach(conn)
+            meta = conn.execute(
+                "SELECT columns, row_count, fingerprint FROM fuzzy_index.meta WHERE table_name = ?",
+                [table_name]
+            ).fetchone()
+            if meta is not None and not stale:
+                columns = [c for c in meta[0].split(",") if c]
+                row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+                current = columns == self.text_columns(conn, table_name) and row_count == meta[1] and (
+                    not columns or sample_fingerprint(conn, table_name, columns, row_count) == meta[2])
+                if current:
+                    with self._state_lock:
+                        if self._writes(table_name) == drops:
+                            self._validated[table_name] = columns
+                    return columns
+            return self._build(conn, table_name)["columns"]
+
+    def build_in_background(self, get_conn, table_name):
+        """Rebuild a stale vocabulary off the request path (after ingest)
+
+        get_conn() is called in the thread; a fuzzy search that arrives first waits
+        for the build instead of starting another.
+        """
+        def run():
+            thread = threading.current_thread()
+            try:
+                cursor = get_conn().cursor()
+                with self._state_lock:
+                    if self._stopping:
+                        cursor.close()
+                        return
+                    self._background[thread] = cursor
+                try:
+                    self.ensure(cursor, table_name)
+                finally:
+                    with self._state_lock:
+                        self._background.pop(thread, None)
+                    cursor.close()
+            except Exception as e:
+                print(f"[FUZZY] Skipped indexing {table_name}: {str(e)}")
+
+        self.background_builds += 1
+        thread = threading.Thread(target=run, name=f"fuzzy-index-{table_name}", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self, timeout=5):
+        """Interrupt background builds and wait for them (at shutdown: a daemon thread still
+        inside DuckDB when the interpreter exits aborts the process)"""
+        with self._state_lock:
+            self._stopping = True
+            running = list(self._background.items())
+        deadline = time.perf_counter() + timeout
+        for thread, cursor in running:
+            # A build runs several statements: keep interrupting until it gives up
+            while thread.is_alive() and time.perf_counter() < deadline:
+                cursor.interrupt()
+                thread.join(0.1)
+
+    def match_tokens(self, conn, table_name, token, distance):
+        """Vocabulary tokens within the edit distance, blocked by trigrams and length
+
+        Returns (matches, truncated): truncated when more than max_verified candidates
+        passed blocking and only the first max_verified were verified.
+        """
+        query_grams = trigrams(token)
+        # Each edit destroys at most 3 trigrams, so true matches share at least this many
+        min_shared = len(query_grams) - 3 * distance
+        vocab, grams = f'fuzzy_index."v_{table_name}"', f'fuzzy_index."g_{table_name}"'
+        placeholders = ", ".join("?" for _ in query_grams)
+        # When the bound is vacuous (short tokens, large distances) the length bucket is the
+        # block; either way the candidates sharing most trigrams are verified first
+        join, having = ("JOIN", f"HAVING count(*) >= {min_shared}") if min_shared > 0 else ("LEFT JOIN", "")
+        # Materialized so levenshtein() only runs on the blocked candidates, at most max_verified of them
+        rows = conn.execute(f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT v.token, v.blocks FROM {vocab} v
+                {join} (
+                    SELECT token, count(*) AS shared_grams FROM {grams}
+                    WHERE gram IN ({placeholders})
+                    GROUP BY token
+                    {having}
+                ) shared USING (token)
+                WHERE v.len BETWEEN {len(token) - distance} AND {len(token) + distance}
+                ORDER BY coalesce(shared.shared_grams, 0) DESC
+                LIMIT {self.max_verified + 1}
+            ),
+            verified AS (
+                SELECT token, levenshtein(token, ?) AS distance, blocks
+                FROM (SELECT * FROM candidates LIMIT {self.max_verified})
+                WHERE levenshtein(token, ?) <= {distance}
+                ORDER BY distance, token
+                LIMIT {self.max_candidates}
+            )
+            SELECT (SELECT count(*) FROM candidates) > {self.max_verified} AS truncated,
+                   verified.token, verified.distance, verified.blocks
+            FROM (SELECT 1) LEFT JOIN verified ON TRUE
+            ORDER BY verified.distance, verified.token
+        """, list(query_grams) + [token, token]).fetchall()
+        matches = [(t, d, blocks) for _, t, d, blocks in rows if t is not None]
+        self.lookups += 1
+        self.tokens_verified += len(matches)
+        return matches, rows[0][0]
+
+    def search_plan(self, conn, table_name, query, distance=None, search_columns=None):
+        """WHERE clause and match report for a fuzzy query
+
+        Every query token must match (in any of the searched text columns): tokens of
+        3+ characters match vocabulary tokens within the edit distance, shorter ones
+        match as substrings. search_columns limits the search (default: every text column).
+        """
+        indexed = self.ensure(conn, table_name)
+        columns = indexed if search_columns is None else [c for c in indexed if c in search_columns]
+        query_tokens = [t for t in TOKEN_SPLIT.split(query.lower()) if t]
+        conditions = []
+        matched = {}
+        truncated_tokens = []
+        candidate_blocks = None
+        for query_token in query_tokens:
+            if len(query_token) < MIN_TOKEN_LENGTH:
+                safe_token = query_token.replace("'", "''")
+                conditions.append("(" + " OR ".join(
+                    f"\"{c}\" ILIKE '%{safe_token}%'" for c in columns
+                ) + ")" if columns else "FALSE")
+                continue
+
+            k = default_distance(query_token) if distance is None else distance
+            matches, truncated = self.match_tokens(conn, table_name, query_token, k)
+            matched[query_token] = [{"token": t, "distance": d} for t, d, _ in matches]
+            if truncated:
+                truncated_tokens.append(query_token)
+            if not matches:
+                conditions.append("FALSE")
+                candidate_blocks = set()
+                continue
+
+            pattern = token_pattern(t for t, _, _ in matches)
+            conditions.append("(" + " OR ".join(
+                f"regexp_matches(lower(\"{c}\"), '{pattern}')" for c in columns
+            ) + ")" if columns else "FALSE")
+
+            token_blocks = set()
+            for _, _, blocks in matches:
+                token_blocks.update(blocks)
+            candidate_blocks = token_blocks if candidate_blocks is None else candidate_blocks & token_blocks
+
+        if not conditions:
+            conditions.append("FALSE")
+        # Tokens with more blocked candidates than max_verified: matches may be missing
+        report = {"columns": columns, "matched_tokens": matched, "truncated_tokens": truncated_tokens}
+        if candidate_blocks is not None:
+            row_count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+            blocks_total = max(1, -(-row_count // self.block_rows))
+            report.update({
+                "blocks_total": blocks_total,
+                "blocks_scanned": len(candidate_blocks),
+                "skip_rate": round(1 - len(candidate_blocks) / blocks_total, 4)
+            })
+            conditions.append(rowid_ranges_predicate(sorted(candidate_blocks), self.block_rows))
+        return " AND ".join(conditions), report
+
+    def drop(self, table_name=None):
+        """Mark a table's vocabulary stale after a write; it is rebuilt on next use
+
+        With no table name (e.g. after a restore) every vocabulary is re-validated instead.
+        """
+        with self._state_lock:
+            if table_name is None:
+                self._validated.clear()
+                self._drops[None] = self._drops.get(None, 0) + 1
+            else:
+                self._stale.add(table_name)
+                self._validated.pop(table_name, None)
+                self._drops[table_name] = self._drops.get(table_name, 0) + 1
+
+    def stats(self, conn):
+        with self._lock:
+            self._attach(conn)
+            rows = conn.execute(
+                "SELECT table_name, columns, row_count, tokens, built_at, build_seconds FROM fuzzy_index.meta"
+            ).fetchall()
+        with self._state_lock:
+            stale = set(self._stale)
+        return {
+            "indexes": [
+                {
+                    "table_name": r[0],
+                    "columns": [c for c in r[1].split(",") if c],
+                    "row_count": r[2],
+                    "tokens": r[3],
+                    "built_at": r[4],
+                    "build_seconds": r[5],
+                    "stale": r[0] in stale
+                }
+                for r in rows
+            ],
+            "background_builds": self.background_builds,
+            "lookups": self.lookups,
+            "tokens_verified": self.tokens_verified
+        }
@@ -0,0 +1,277 @@
+"""
+Request metrics
+Counters, gauges and latency histograms rendered in the Prometheus text format
+for GET /metrics. A pure ASGI middleware times every request and counts the
+bytes it sends; code that runs queries adds DuckDB time, serialization time and
+row counts to the current request through a context variable, so each request
+pays a few perf_counter() calls and one lock per metric.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; wide enough for 1 ms cached pages up to minute-long exports
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_request = contextvars.ContextVar("gigasheet_request_metrics", default=None)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Gauge:
+    """A value read when /metrics is scraped (from a callback) or set directly
+
+    With labelnames the callback returns {label_values_tuple: value}.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, help, callback=None, labelnames=()):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        value = self.value
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                return
+        if not self.labelnames:
+            yield self.name, "", value
+            return
+        for labels, labelled_value in sorted(value.items()):
+            yield self.name, _format_labels(self.labelnames, labels), labelled_value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                yield (self.name + "_bucket",
+                       _format_labels(self.labelnames, labels, ("le", _format_value(bound))),
+                       cumulative)
+            yield self.name + "_sum", _format_labels(self.labelnames, labels), values[-1]
+            yield self.name + "_count", _format_labels(self.labelnames, labels), cumulative
+
+
+class RequestMetrics:
+    """What one request spent in DuckDB and in serialization, and how many rows it touched"""
+
+    __slots__ = ("query_seconds", "serialize_seconds", "rows_scanned", "rows_returned")
+
+    def __init__(self):
+        self.query_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.rows_scanned = 0
+        self.rows_returned = 0
+
+
+class MetricsRegistry:
+    def __init__(self, prefix="gigasheet"):
+        self.prefix = prefix
+        self._metrics = []
+        self.requests = self.histogram("request_duration_seconds",
+                                       "Time from request start to the last response byte",
+                                       ("method", "route", "status"))
+        self.query_time = self.histogram("duckdb_query_seconds",
+                                         "Time per request spent executing and fetching DuckDB queries",
+                                         ("route",))
+        self.serialize_time = self.histogram("serialization_seconds",
+                                             "Time per request spent converting result rows for the response",
+                                             ("route",))
+        self.response_bytes = self.counter("response_bytes_total", "Response body bytes sent", ("route",))
+        self.rows_scanned = self.counter("rows_scanned_total",
+                                         "Table rows read by queries (estimated from catalog row counts)",
+                                         ("route",))
+        self.rows_returned = self.counter("rows_returned_total", "Rows returned to clients", ("route",))
+        self.in_flight = self.gauge("requests_in_flight", "Requests currently being handled")
+        self._route_names = {}
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(f"{self.prefix}_{name}", help, labelnames))
+
+    def gauge(self, name, help, callback=None, labelnames=()):
+        return self._register(Gauge(f"{self.prefix}_{name}", help, callback, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(f"{self.prefix}_{name}", help, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def route_name(self, scope):
+        """The route template (/tables/{table_name}/data) rather than the raw path, to bound label values"""
+        route = scope.get("route")
+        if route is not None:
+            return getattr(route, "path", "unmatched")
+        # Older Starlette only leaves the endpoint in the scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        name = self._route_names.get(endpoint)
+        if name is None:
+            name = "unmatched"
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    name = candidate.path
+                    break
+            self._route_names[endpoint] = name
+        return name
+
+    # Recording from inside a request (no-ops outside one)
+
+    @contextmanager
+    def timing_query(self):
+        current = _current_request.get()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if current is not None:
+                current.query_seconds += time.perf_counter() - start
+
+    @contextmanager
+    def timing_serialization(self):
+        current = _current_request.get()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if current is not None:
+                current.serialize_seconds += time.perf_counter() - start
+
+    def add_rows(self, scanned=0, returned=0):
+        current = _current_request.get()
+        if current is not None:
+            current.rows_scanned += scanned
+            current.rows_returned += returned
+
+
+class MetricsMiddleware:
+    """ASGI middleware; wraps the whole response, so streamed bodies are timed and counted too"""
+
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+        self.active = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        registry = self.registry
+        current = RequestMetrics()
+        token = _current_request.set(current)
+        start = time.perf_counter()
+        status = 500
+        sent = 0
+
+        async def counting_send(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        self.active += 1
+        registry.in_flight.set(self.active)
+        try:
+            await self.app(scope, receive, counting_send)
+        finally:
+            self.active -= 1
+            registry.in_flight.set(self.active)
+            _current_request.reset(token)
+            route = registry.route_name(scope)
+            registry.requests.observe(time.perf_counter() - start, scope["method"], route, str(status))
+            if current.query_seconds:
+                registry.query_time.observe(current.query_seconds, route)
+            if current.serialize_seconds:
+                registry.serialize_time.observe(current.serialize_seconds, route)
+            registry.response_bytes.inc(sent, route)
+            if current.rows_scanned:
+                registry.rows_scanned.inc(current.rows_scanned, route)
+            if current.rows_returned:
+                registry.rows_returned.inc(current.rows_returned, route)
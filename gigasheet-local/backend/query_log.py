@@ -0,0 +1,178 @@
+"""
+Slow query log
+Statements run through the log get their own cursor with DuckDB's profiler
+switched on (no output, so it only collects operator timings). When one takes
+longer than the threshold, its SQL, parameters, timing and operator tree are
+kept in a ring buffer and appended as a JSON line to an on-disk log. Every
+profile read (also of fast statements) is passed to subscribers, which use it
+to spot spills to the temp directory and to measure throughput.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_THRESHOLD_SECONDS = 1.0
+MAX_SQL_CHARS = 20000
+# Profiles of statements faster than this are not read (nothing spilled, too short to measure)
+PROFILE_MIN_SECONDS = 0.01
+
+
+def _fetch_rows_and_columns(cursor):
+    return cursor.fetchall(), [desc[0] for desc in cursor.description]
+
+
+def _operator_tree(node):
+    """Keep the parts of a profiler node that explain where the time went"""
+    return {
+        "operator": node.get("operator_name") or node.get("operator_type") or node.get("name"),
+        "seconds": node.get("operator_timing", node.get("timing")),
+        "rows": node.get("operator_cardinality", node.get("cardinality")),
+        "rows_scanned": node.get("operator_rows_scanned"),
+        "extra_info": node.get("extra_info"),
+        "children": [_operator_tree(child) for child in node.get("children", [])]
+    }
+
+
+class SlowQueryLog:
+    def __init__(self, log_path, threshold_seconds=DEFAULT_THRESHOLD_SECONDS, capacity=200,
+                 max_log_bytes=50 * 1024 * 1024):
+        self.log_path = log_path
+        self.threshold_seconds = threshold_seconds
+        self._listeners = []
+        self.max_log_bytes = max_log_bytes
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.profiling_available = True
+        self.recorded = 0
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+    def cursor(self, conn):
+        """A new cursor of conn with profiling on, so its last statement's plan can be read back"""
+        cursor = conn.cursor()
+        if self.profiling_available:
+            try:
+                cursor.execute("PRAGMA enable_profiling='no_output'")
+            except Exception as e:
+                # Older DuckDB has no silent profiling mode; log timings without plans
+                self.profiling_available = False
+                print(f"[SLOW-QUERY] Query profiling unavailable: {str(e)}")
+        return cursor
+
+    @contextmanager
+    def track(self, cursor, sql, params=None, source=None):
+        """Time the block (execute + fetch on cursor) and record it if it was slow"""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            profile = None
+            if error is None and elapsed >= min(self.threshold_seconds, PROFILE_MIN_SECONDS):
+                profile = self._profile(cursor)
+            if profile:
+                self._notify(source, sql, elapsed, profile)
+            if elapsed >= self.threshold_seconds:
+                self._record(sql, params, elapsed, source, self._plan(profile), error)
+
+    def subscribe(self, listener):
+        """listener(source, sql, seconds, profile) is called with each profile read"""
+        self._listeners.append(listener)
+
+    def _notify(self, source, sql, seconds, profile):
+        for listener in self._listeners:
+            try:
+                listener(source, sql, seconds, profile)
+            except Exception as e:
+                print(f"[SLOW-QUERY] Profile listener failed: {str(e)}")
+
+    def run(self, conn, sql, params=None, source=None, fetch=_fetch_rows_and_columns):
+        """Execute sql on a profiled cursor and return fetch(cursor) (rows and column names by default)"""
+        cursor = self.cursor(conn)
+        try:
+            with self.track(cursor, sql, params, source):
+                if params is None:
+                    cursor.execute(sql)
+                else:
+                    cursor.execute(sql, params)
+                return fetch(cursor)
+        finally:
+            cursor.close()
+
+    def _profile(self, cursor):
+        if not self.profiling_available:
+            return None
+        try:
+            return json.loads(cursor.get_profiling_information(format="json"))
+        except Exception:
+            return None
+
+    @staticmethod
+    def _plan(profile):
+        if profile is None:
+            return None
+        return {
+            "latency_seconds": profile.get("latency"),
+            "cpu_seconds": profile.get("cpu_time"),
+            "rows_scanned": profile.get("cumulative_rows_scanned"),
+            "rows_returned": profile.get("rows_returned"),
+            "peak_buffer_memory_bytes": profile.get("system_peak_buffer_memory"),
+            "peak_temp_dir_bytes": profile.get("system_peak_temp_dir_size"),
+            "operators": [_operator_tree(child) for child in profile.get("children", [])]
+        }
+
+    def _record(self, sql, params, elapsed, source, plan, error):
+        sql = " ".join(sql.split())
+        with self._lock:
+            entry = {
+                "id": self._next_id,
+                "timestamp": time.time(),
+                "source": source,
+                "seconds": round(elapsed, 4),
+                "sql": sql[:MAX_SQL_CHARS],
+                "params": [str(p) for p in params] if params is not None else None,
+                "error": error,
+                "plan": plan
+            }
+            self._next_id += 1
+            self._entries.append(entry)
+            self.recorded += 1
+            try:
+                self._rotate_if_full()
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, default=str) + "\n")
+            except OSError as e:
+                print(f"[SLOW-QUERY] Could not write {self.log_path}: {str(e)}")
+        print(f"[SLOW-QUERY] {source or 'query'} took {elapsed:.2f}s: {sql[:200]}")
+
+    def _rotate_if_full(self):
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) >= self.max_log_bytes:
+            os.replace(self.log_path, self.log_path + ".1")
+
+    def list(self, limit=None, source=None):
+        """Most recent slow queries first"""
+        with self._lock:
+            entries = [e for e in reversed(self._entries) if source is None or e["source"] == source]
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "threshold_seconds": self.threshold_seconds,
+            "buffered": len(self._entries),
+            "capacity": self._entries.maxlen,
+            "recorded_total": self.recorded,
+            "profiling_available": self.profiling_available,
+            "log_path": self.log_path
+        }
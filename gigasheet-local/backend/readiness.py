@@ -0,0 +1,283 @@
+"""
+Billion-row readiness benchmark
+Generates N synthetic rows as a CSV on local disk, loads them into a scratch
+database opened with the server's DuckDB settings, and times the statements
+the app runs on a large table: ingest, count, a filtered page, a deep page, a
+global search, a full sort and a CSV export. Each step's measured rate is
+extrapolated linearly to a billion rows (every step is a full scan or a sort,
+so time grows with the row count), and each run is appended to a JSON-lines
+file so runs can be compared over time.
+
+    python readiness.py --rows 10000000 --memory-limit 6GB --threads 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+import duckdb
+
+TARGET_ROWS = 1_000_000_000
+# Largest benchmark the API will run; the CLI has no limit
+MAX_BENCHMARK_ROWS = 50_000_000
+# Paging and search at the target size should stay interactive
+INTERACTIVE_SECONDS = 30.0
+INTERACTIVE_STEPS = ("filtered_page", "deep_page", "global_search")
+PAGE_SIZE = 100
+
+CITIES = ["Berlin", "Mumbai", "Lagos", "Austin", "Osaka", "Lima", "Toronto", "Cairo",
+          "Madrid", "Jakarta", "Denver", "Seoul", "Nairobi", "Oslo", "Quito", "Dublin"]
+STATUSES = ["active", "pending", "closed", "refunded"]
+
+
+def _generate_sql(rows, path):
+    """Deterministic mixed-type rows (ids, names, emails, cities, amounts, dates)"""
+    cities = ", ".join(f"'{c}'" for c in CITIES)
+    statuses = ", ".join(f"'{s}'" for s in STATUSES)
+    return f"""
+        COPY (
+            SELECT
+                i AS id,
+                'customer_' || (i * 7919 % 1000003) AS name,
+                'user' || (i * 104729 % 999983) || '@example.com' AS email,
+                [{cities}][(i * 31 % {len(CITIES)}) + 1] AS city,
+                round((i * 2654435761 % 10000000) / 100.0, 2) AS amount,
+                DATE '2015-01-01' + CAST(i * 37 % 3650 AS INTEGER) AS created,
+                [{statuses}][(i * 13 % {len(STATUSES)}) + 1] AS status
+            FROM range({int(rows)}) t(i)
+        ) TO '{path}' (FORMAT CSV, HEADER TRUE, DELIMITER ',')
+    """
+
+
+def _steps(table, rows, csv_path, export_path):
+    """(name, sql or [sql, ...], fetch) in run order; SQL has the same shape as the app's queries"""
+    search_columns = ["id", "name", "email", "city", "amount", "created", "status"]
+    search = " OR ".join(f"CAST({col} AS VARCHAR) ILIKE '%4242%'" for col in search_columns)
+    page_filter = "WHERE CAST(city AS VARCHAR) ILIKE '%lin%' AND CAST(status AS VARCHAR) ILIKE '%act%'"
+    return [
+        ("ingest", f"""
+            CREATE OR REPLACE TABLE {table} AS
+            SELECT * FROM read_csv_auto('{csv_path}',
+                header=true,
+                ignore_errors=true,
+                max_line_size=1048576)
+        """, None),
+        ("count", f"SELECT COUNT(*) FROM {table}", "one"),
+        # A page stops reading early; its total count (also run per page) scans the whole table
+        ("filtered_page", [f"SELECT * FROM {table} {page_filter} LIMIT {PAGE_SIZE} OFFSET 0",
+                           f"SELECT COUNT(*) FROM {table} {page_filter}"], "all"),
+        ("deep_page", f"SELECT * FROM {table} LIMIT {PAGE_SIZE} OFFSET {max(0, int(rows) - PAGE_SIZE)}", "all"),
+        ("global_search", f"""
+            SELECT rowid AS _search_rid FROM {table}
+            WHERE {search}
+            ORDER BY rowid
+        """, "all"),
+        ("sort", f"CREATE OR REPLACE TABLE {table}_sorted AS SELECT * FROM {table} ORDER BY amount DESC, id", None),
+        ("export", f"COPY (SELECT * FROM {table}) TO '{export_path}' (FORMAT CSV, HEADER TRUE, DELIMITER ',')", "one"),
+    ]
+
+
+def _profile(cursor):
+    try:
+        profile = json.loads(cursor.get_profiling_information(format="json"))
+    except Exception:
+        return {}
+    return {"peak_memory_bytes": profile.get("system_peak_buffer_memory"),
+            "peak_temp_bytes": profile.get("system_peak_temp_dir_size")}
+
+
+class ReadinessBenchmark:
+    def __init__(self, work_dir, results_path):
+        self.work_dir = work_dir
+        self.results_path = results_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(results_path), exist_ok=True)
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    def run(self, rows, connect, disk_path=None, target_rows=TARGET_ROWS):
+        """Benchmark `rows` synthetic rows on a database opened by connect(path)
+
+        Raises RuntimeError if a benchmark is already running. Scratch files are
+        removed afterwards; the result is appended to the results file.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A readiness benchmark is already running")
+        try:
+            return self._run(int(rows), connect, disk_path or self.work_dir, target_rows)
+        finally:
+            self._lock.release()
+
+    def _run(self, rows, connect, disk_path, target_rows):
+        run_dir = os.path.join(self.work_dir, f"run_{int(time.time() * 1000)}")
+        os.makedirs(run_dir, exist_ok=True)
+        csv_path = os.path.join(run_dir, "bench.csv").replace('\\', '/')
+        export_path = os.path.join(run_dir, "export.csv").replace('\\', '/')
+        db_path = os.path.join(run_dir, "bench.duckdb")
+        print(f"[READINESS] Benchmarking {rows:,} rows in {run_dir}")
+        started = time.time()
+        connection = connect(db_path)
+        try:
+            generate_start = time.perf_counter()
+            connection.execute(_generate_sql(rows, csv_path))
+            generate_seconds = time.perf_counter() - generate_start
+            steps = {}
+            for name, sql, fetch in _steps("bench", rows, csv_path, export_path):
+                steps[name] = self._time_step(connection, sql, fetch, rows, target_rows)
+                print(f"[READINESS] {name}: {steps[name]['seconds']:.2f}s")
+            connection.execute("CHECKPOINT")
+            csv_bytes = os.path.getsize(csv_path)
+            settings = connection.execute(
+                "SELECT current_setting('memory_limit'), current_setting('threads')"
+            ).fetchone()
+        finally:
+            connection.close()
+        db_bytes = os.path.getsize(db_path)
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+        scale = target_rows / rows
+        storage_gb = db_bytes * scale / (1024**3)
+        source_gb = csv_bytes * scale / (1024**3)
+        # The sorted copy and the source file sit next to the table while it is worked on
+        needed_gb = storage_gb * 2 + source_gb
+        disk_free_gb = shutil.disk_usage(disk_path).free / (1024**3)
+        slow_steps = [name for name in INTERACTIVE_STEPS
+                      if steps[name]["projected_seconds"] > INTERACTIVE_SECONDS]
+        checks = {
+            "disk_ok": needed_gb <= disk_free_gb,
+            "interactive_ok": not slow_steps
+        }
+        result = {
+            "timestamp": started,
+            "rows": rows,
+            "target_rows": target_rows,
+            "duration_seconds": round(time.time() - started, 2),
+            "settings": {"memory_limit": settings[0], "threads": settings[1]},
+            "generate_seconds": round(generate_seconds, 3),
+            "steps": steps,
+            "storage": {
+                "db_bytes_per_row": round(db_bytes / rows, 1),
+                "csv_bytes_per_row": round(csv_bytes / rows, 1),
+                "projected_db_gb": round(storage_gb, 2),
+                "projected_csv_gb": round(source_gb, 2),
+                "projected_disk_needed_gb": round(needed_gb, 2),
+                "disk_free_gb": round(disk_free_gb, 2)
+            },
+            "checks": checks,
+            "ready_for_billion_rows": all(checks.values()),
+            "recommendations": self._recommendations(checks, slow_steps, needed_gb, disk_free_gb)
+        }
+        self._append(result)
+        return result
+
+    @staticmethod
+    def _time_step(connection, sql, fetch, rows, target_rows):
+        cursor = connection.cursor()
+        try:
+            try:
+                cursor.execute("PRAGMA enable_profiling='no_output'")
+            except Exception:
+                pass  # older DuckDB: timings without peak memory
+            start = time.perf_counter()
+            for statement in ([sql] if isinstance(sql, str) else sql):
+                cursor.execute(statement)
+                if fetch == "one":
+                    cursor.fetchone()
+                elif fetch == "all":
+                    cursor.fetchall()
+            seconds = time.perf_counter() - start
+            step = {
+                "seconds": round(seconds, 4),
+                "rows_per_second": round(rows / seconds) if seconds else None,
+                "projected_seconds": round(seconds * target_rows / rows, 1)
+            }
+            step.update(_profile(cursor))
+            return step
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _recommendations(checks, slow_steps, needed_gb, disk_free_gb):
+        recommendations = []
+        if not checks["disk_ok"]:
+            recommendations.append(f"Disk: {needed_gb:.0f}GB needed for a billion rows, {disk_free_gb:.0f}GB free")
+        if slow_steps:
+            recommendations.append(f"Over {INTERACTIVE_SECONDS:.0f}s at a billion rows: {', '.join(slow_steps)}; "
+                                   "add cores, use column filters or split the table")
+        if not recommendations:
+            recommendations.append("Measured throughput and disk space are sufficient for a billion rows")
+        return recommendations
+
+    def _append(self, result):
+        try:
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result) + "\n")
+        except OSError as e:
+            print(f"[READINESS] Could not write {self.results_path}: {str(e)}")
+
+    def history(self, limit=None):
+        """Stored runs, most recent first"""
+        if not os.path.exists(self.results_path):
+            return []
+        runs = []
+        with open(self.results_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue  # partially written line
+        runs.reverse()
+        return runs[:limit] if limit else runs
+
+
+def trend(runs):
+    """Per-step change in rows/sec of the latest run against the previous run of the same size"""
+    if not runs:
+        return None
+    latest = runs[0]
+    previous = next((r for r in runs[1:] if r["rows"] == latest["rows"]), None)
+    if previous is None:
+        return None
+    change = {}
+    for name, step in latest["steps"].items():
+        before = previous["steps"].get(name, {}).get("rows_per_second")
+        if before and step.get("rows_per_second"):
+            change[name] = round((step["rows_per_second"] - before) / before * 100, 1)
+    return {"compared_to": previous["timestamp"], "rows_per_second_change_percent": change}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Billion-row readiness benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic rows to generate")
+    parser.add_argument("--dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "readiness"),
+                        help="Scratch directory (on the disk the data will live on)")
+    parser.add_argument("--results", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                          "logs", "readiness_benchmarks.jsonl"))
+    parser.add_argument("--memory-limit", help="DuckDB memory_limit, e.g. 24GB (default: detected)")
+    parser.add_argument("--threads", type=int, help="DuckDB threads (default: detected)")
+    args = parser.parse_args()
+
+    from resource_profile import load_profile
+
+    # Same detection and GIGASHEET_* overrides as the server; flags override both
+    overrides = {}
+    if args.threads:
+        overrides["GIGASHEET_THREADS"] = str(args.threads)
+    if args.memory_limit:
+        overrides["GIGASHEET_MEMORY_LIMIT"] = args.memory_limit
+    profile = load_profile(os.path.join(args.dir, "temp"), environ={**os.environ, **overrides})
+
+    def connect(path):
+        return profile.apply(duckdb.connect(path))
+
+    benchmark = ReadinessBenchmark(args.dir, args.results)
+    result = benchmark.run(args.rows, connect)
+    print(json.dumps(result, indent=2))
+    comparison = trend(benchmark.history())
+    if comparison:
+        print(json.dumps(comparison, indent=2))
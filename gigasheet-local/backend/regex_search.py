@@ -0,0 +1,122 @@
+"""
+Regex search with safeguards
+Patterns are validated once per query, pushed down to DuckDB's RE2 engine
+(linear time, no catastrophic backtracking), pre-filtered by a literal
+substring every match must contain, and run under a per-query time budget.
+"""
+
+import re
+import threading
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+MAX_PATTERN_LENGTH = 1000
+MIN_PREFILTER_LENGTH = 3
+DEFAULT_TIME_BUDGET_SECONDS = 10.0
+
+
+class RegexError(ValueError):
+    pass
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+def _required_literals(parsed):
+    """Literal runs that every match of a parsed (sub)pattern must contain"""
+    runs = []
+    current = []
+
+    def flush():
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(arg))
+            continue
+        flush()
+        if op is sre_parse.SUBPATTERN:
+            # A plain group is mandatory, so its own literals are required too -
+            # unless it switches case sensitivity locally, e.g. (?i:abc)
+            add_flags, del_flags = arg[1], arg[2]
+            if not (add_flags | del_flags) & re.IGNORECASE:
+                runs.extend(_required_literals(arg[-1]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and arg[0] >= 1:
+            runs.extend(_required_literals(arg[2]))
+    flush()
+    return runs
+
+
+class RegexQuery:
+    def __init__(self, pattern):
+        if len(pattern) > MAX_PATTERN_LENGTH:
+            raise RegexError(f"Pattern longer than {MAX_PATTERN_LENGTH} characters")
+        try:
+            compiled = re.compile(pattern)
+            parsed = sre_parse.parse(pattern)
+        except re.error as e:
+            raise RegexError(f"Invalid regex: {str(e)}")
+        self.pattern = pattern
+        self.ignore_case = bool(compiled.flags & re.IGNORECASE)
+        literals = _required_literals(parsed)
+        longest = max(literals, key=len, default="")
+        self.prefilter = longest if len(longest) >= MIN_PREFILTER_LENGTH else None
+
+    @property
+    def sql_pattern(self):
+        return self.pattern.replace("'", "''")
+
+    def validate(self, conn):
+        """RE2 rejects some Python syntax (lookarounds, backreferences) - fail fast with a clear error"""
+        try:
+            conn.execute(f"SELECT regexp_matches('', '{self.sql_pattern}')").fetchone()
+        except Exception as e:
+            raise RegexError(f"Pattern not supported by DuckDB's RE2 engine: {str(e)}")
+
+    def condition(self, value_sql):
+        """SQL predicate for one value; the cheap literal check runs before the regex"""
+        regex = f"regexp_matches({value_sql}, '{self.sql_pattern}')"
+        if self.prefilter is None:
+            return regex
+        if self.ignore_case:
+            safe_literal = self.prefilter.lower().replace("'", "''")
+            return f"(contains(lower({value_sql}), '{safe_literal}') AND {regex})"
+        safe_literal = self.prefilter.replace("'", "''")
+        return f"(contains({value_sql}, '{safe_literal}') AND {regex})"
+
+
+def execute_with_time_budget(conn, sql, seconds=DEFAULT_TIME_BUDGET_SECONDS, query_log=None, source=None):
+    """Run a statement on its own cursor, interrupting it once the budget is spent
+
+    Returns (rows, column_names); raises QueryTimeout if interrupted. With a
+    query_log the cursor is profiled and slow statements are recorded.
+    """
+    cursor = query_log.cursor(conn) if query_log is not None else conn.cursor()
+    timed_out = threading.Event()
+
+    def interrupt():
+        timed_out.set()
+        cursor.interrupt()
+
+    timer = threading.Timer(seconds, interrupt)
+    timer.start()
+    try:
+        if query_log is not None:
+            with query_log.track(cursor, sql, source=source):
+                rows = cursor.execute(sql).fetchall()
+        else:
+            rows = cursor.execute(sql).fetchall()
+        return rows, [desc[0] for desc in cursor.description]
+    except Exception:
+        if timed_out.is_set():
+            raise QueryTimeout(f"Query exceeded its {seconds:g}s time budget")
+        raise
+    finally:
+        timer.cancel()
+        cursor.close()
@@ -0,0 +1,367 @@
+"""
+Read replicas
+DuckDB lets one process open a database file for writing, and while it does no
+other process can open that file at all. For multi-process serving (serve.py)
+the writer therefore publishes consistent snapshots of its database to
+replicas/ after writes (debounced, so a burst of writes is one publish), and
+reader workers open the newest snapshot read-only. A snapshot is one .db file
+per table version: a publish copies only the tables written since the last
+one and reuses the files of the others, so its cost is the size of the
+changed tables (a rewritten 10 GB table is copied once more; untouched tables
+are not). Readers attach a snapshot's files, poll CURRENT.json and switch to
+a new snapshot between requests, without restarting. Writes that reach a
+reader are redirected to the writer.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from backup import copy_tables
+
+CURRENT_FILE = "CURRENT.json"
+TABLES_DIR = "tables"
+# Snapshots whose files are kept on disk; readers still on an older one hold them open until they switch
+KEEP_SNAPSHOTS = 3
+# Publish once writes have been quiet this long, but never later than MAX_DELAY after the first
+PUBLISH_DEBOUNCE_SECONDS = 2.0
+PUBLISH_MAX_DELAY_SECONDS = 30.0
+POLL_SECONDS = 1.0
+
+# Served by the writer only: every non-read method, plus reads of state that lives in the writer
+# (export jobs, backups and restores, the readiness benchmark's scratch database)
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+WRITER_READ_PATHS = ("/export/jobs", "/backup/", "/system/billion-row-check")
+
+
+def table_file(table_name, epoch, version):
+    """Snapshot file of one table version (names are sanitized; the hash keeps them distinct)"""
+    safe_name = re.sub(r"[^A-Za-z0-9_]", "_", table_name)[:64]
+    digest = hashlib.sha1(table_name.encode("utf-8")).hexdigest()[:8]
+    return f"{TABLES_DIR}/{safe_name}_{digest}_{epoch[:8]}_v{version}.db"
+
+
+def read_current(snapshot_dir):
+    """Manifest of the newest published snapshot, or None before the first"""
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class SnapshotPublisher:
+    """Writer side: copies the tables written since the last snapshot to replicas/tables/ after writes"""
+
+    def __init__(self, snapshot_dir, catalog, keep=KEEP_SNAPSHOTS,
+                 debounce_seconds=PUBLISH_DEBOUNCE_SECONDS, max_delay_seconds=PUBLISH_MAX_DELAY_SECONDS):
+        self.snapshot_dir = snapshot_dir
+        self.catalog = catalog
+        self.keep = keep
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        os.makedirs(os.path.join(snapshot_dir, TABLES_DIR), exist_ok=True)
+        current = read_current(snapshot_dir)
+        self.generation = current["generation"] if current else 0
+        self.last_published = current
+        # Manifests whose files are kept (the newest last)
+        self._recent = deque([current] if current else [], maxlen=keep)
+        self.last_error = None
+        self.publishes = 0
+        self._lock = threading.Lock()
+        self._dirty_since = None
+        self._last_write = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def mark_dirty(self, table_name=None):
+        """Catalog listener: a table (or every table) changed"""
+        now = time.time()
+        with self._lock:
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._last_write = now
+        self._wake.set()
+
+    def start(self, get_conn):
+        """Publish in a background thread; the first snapshot is published right away"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        with self._lock:
+            self._dirty_since = self._last_write = time.time() - self.debounce_seconds
+        self._wake.set()
+        self._thread = threading.Thread(target=self._run, args=(get_conn,), name="replica-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _due_in(self):
+        """Seconds until the pending publish is due (None if nothing is pending)"""
+        with self._lock:
+            if self._dirty_since is None:
+                return None
+            due = min(self._last_write + self.debounce_seconds, self._dirty_since + self.max_delay_seconds)
+        return max(0.0, due - time.time())
+
+    def _run(self, get_conn):
+        while not self._stop.is_set():
+            wait = self._due_in()
+            if wait is None or wait > 0:
+                self._wake.wait(timeout=wait)
+                self._wake.clear()
+                continue
+            with self._lock:
+                self._dirty_since = self._last_write = None
+            try:
+                self.publish(get_conn())
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[REPLICA] Publish failed: {str(e)}")
+                self.mark_dirty()  # retried after the debounce
+
+    def publish(self, conn):
+        """Copy the tables changed since the last snapshot and make a new snapshot current"""
+        start = time.time()
+        generation = self.generation + 1
+        version_of = self.catalog.snapshot()
+        epoch = self.catalog.epoch
+        previous = (self.last_published or {}).get("tables", {})
+        files, targets = {}, {}
+        for table_name in self._table_names(conn):
+            filename = table_file(table_name, epoch, version_of(table_name))
+            files[table_name] = filename
+            path = os.path.join(self.snapshot_dir, filename)
+            if previous.get(table_name, {}).get("file") == filename and os.path.exists(path):
+                continue  # unchanged since the last snapshot
+            if os.path.exists(path):
+                os.remove(path)  # left behind by a publish that crashed
+            targets[table_name] = path
+        copied = copy_tables(conn, targets, alias="replica_table")
+        # Tables created or dropped after the listing are published next time (their bump marked us dirty)
+        tables = [t for t in files if t not in targets or t in copied]
+        manifest = {
+            "generation": generation,
+            "published_at": time.time(),
+            "seconds": round(time.time() - start, 3),
+            "epoch": epoch,
+            "tables": {
+                name: {
+                    "file": files[name],
+                    "version": version_of(name),
+                    "size_bytes": os.path.getsize(os.path.join(self.snapshot_dir, files[name]))
+                }
+                for name in tables
+            },
+            "copied": sorted(copied)
+        }
+        manifest["size_bytes"] = sum(t["size_bytes"] for t in manifest["tables"].values())
+        manifest["copied_bytes"] = sum(manifest["tables"][t]["size_bytes"] for t in manifest["copied"])
+        current_path = os.path.join(self.snapshot_dir, CURRENT_FILE)
+        with open(current_path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(current_path + ".tmp", current_path)  # readers only see complete snapshots
+        self.generation = generation
+        self.last_published = manifest
+        self.last_error = None
+        self.publishes += 1
+        self._recent.append(manifest)
+        self._prune()
+        print(f"[REPLICA] Published snapshot {generation}: copied {len(manifest['copied'])} of "
+              f"{len(tables)} tables ({manifest['copied_bytes']:,} bytes) in {manifest['seconds']}s")
+        return manifest
+
+    @staticmethod
+    def _table_names(conn):
+        cursor = conn.cursor()
+        try:
+            return [name for (name,) in cursor.execute(
+                "SELECT table_name FROM duckdb_tables() "
+                "WHERE database_name = current_database() AND schema_name = 'main' AND NOT temporary"
+            ).fetchall()]
+        finally:
+            cursor.close()
+
+    def _prune(self):
+        """Remove table files no kept snapshot uses"""
+        used = {entry["file"] for manifest in self._recent for entry in manifest.get("tables", {}).values()}
+        tables_dir = os.path.join(self.snapshot_dir, TABLES_DIR)
+        for filename in os.listdir(tables_dir):
+            if f"{TABLES_DIR}/{filename}" in used or not filename.endswith((".db", ".db.wal")):
+                continue
+            try:
+                os.remove(os.path.join(tables_dir, filename))
+            except OSError:
+                pass  # still open in a reader on Windows; removed by a later publish
+
+    def status(self):
+        return {
+            "generation": self.generation,
+            "publishes": self.publishes,
+            "pending": self._dirty_since is not None,
+            "last_published": self.last_published,
+            "last_error": self.last_error
+        }
+
+
+class SnapshotFollower:
+    """Reader side: opens the newest snapshot read-only and switches when a newer one is published"""
+
+    def __init__(self, snapshot_dir, connect, poll_seconds=POLL_SECONDS):
+        self.snapshot_dir = snapshot_dir
+        # connect({table_name: path}) -> connection serving those table files (see open_snapshot)
+        self.connect = connect
+        self.poll_seconds = poll_seconds
+        self.manifest = None
+        self.switches = 0
+        self.switch_deferrals = 0
+        self.last_switch = None
+        self.last_error = None
+
+    @property
+    def generation(self):
+        return self.manifest["generation"] if self.manifest else 0
+
+    def wait_for_snapshot(self, timeout):
+        """Block until the writer has published (at startup); the manifest of the newest snapshot"""
+        deadline = time.time() + timeout
+        while True:
+            manifest = read_current(self.snapshot_dir)
+            if manifest is not None:
+                return manifest
+            if time.time() >= deadline:
+                raise RuntimeError(f"No snapshot in {self.snapshot_dir} after {timeout}s; is the writer running?")
+            time.sleep(self.poll_seconds)
+
+    def open(self, manifest):
+        return self.connect({name: os.path.join(self.snapshot_dir, entry["file"])
+                             for name, entry in manifest["tables"].items()})
+
+    def opened(self, manifest):
+        """Record that the server now reads this snapshot"""
+        if self.manifest is not None:
+            self.switches += 1
+            self.last_switch = time.time()
+        self.manifest = manifest
+
+    async def follow(self, switch):
+        """Poll for newer snapshots; await switch(conn, manifest) -> bool puts one in service
+
+        When switch returns False (running requests did not drain) the new connection is
+        closed and the switch is retried at the next poll.
+        """
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            manifest = read_current(self.snapshot_dir)
+            if manifest is None or manifest["generation"] <= self.generation:
+                continue
+            try:
+                conn = await asyncio.to_thread(self.open, manifest)
+            except Exception as e:
+                # Pruned before we got to it; a newer one is current by now
+                self.last_error = str(e)
+                print(f"[REPLICA] Could not open snapshot {manifest['generation']}: {str(e)}")
+                continue
+            if await switch(conn, manifest):
+                self.opened(manifest)
+                self.last_error = None
+                print(f"[REPLICA] Reading snapshot {manifest['generation']}")
+            else:
+                conn.close()
+                self.switch_deferrals += 1
+
+    def status(self):
+        return {
+            "generation": self.generation,
+            "snapshot": self.manifest,
+            "lag_seconds": round(time.time() - self.manifest["published_at"], 3) if self.manifest else None,
+            "switches": self.switches,
+            "switch_deferrals": self.switch_deferrals,
+            "last_switch": self.last_switch,
+            "last_error": self.last_error
+        }
+
+
+class ReplicaConnection:
+    """A connection whose tables are attached snapshot files, found through search_path
+
+    search_path is a per-connection setting in DuckDB, so it is set again on every
+    cursor; everything else is the wrapped connection's.
+    """
+
+    def __init__(self, conn, search_path):
+        self._conn = conn
+        self.search_path = search_path
+        self._set_search_path(conn)
+
+    def _set_search_path(self, connection):
+        if self.search_path:
+            connection.execute(f"SET search_path = '{self.search_path}'")
+        return connection
+
+    def cursor(self):
+        return self._set_search_path(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def open_snapshot(conn, table_paths):
+    """Attach one read-only file per table to conn (an in-memory database); a ReplicaConnection"""
+    aliases = []
+    try:
+        for i, (table_name, path) in enumerate(sorted(table_paths.items())):
+            alias = f"replica_{i}"
+            sanitized_path = path.replace('\\', '/')
+            conn.execute(f"ATTACH '{sanitized_path}' AS {alias} (READ_ONLY)")
+            aliases.append(alias)
+    except Exception:
+        conn.close()  # a file was pruned before we got to it
+        raise
+    return ReplicaConnection(conn, ",".join(f"{alias}.main" for alias in aliases))
+
+
+class WriterRedirectMiddleware:
+    """ASGI middleware for readers: 307-redirects writes (and writer-only reads) to the writer
+
+    The writer is writer_url if given, else the host the client used on writer_port.
+    307 keeps the method and body, so uploads are re-sent as they were.
+    """
+
+    def __init__(self, app, writer_url=None, writer_port=None):
+        self.app = app
+        self.writer_url = writer_url.rstrip("/") if writer_url else None
+        self.writer_port = writer_port
+
+    def _location(self, scope):
+        if self.writer_url:
+            base = self.writer_url
+        else:
+            headers = dict(scope["headers"])
+            host = headers.get(b"host", b"localhost").decode("latin-1")
+            if not host.endswith("]"):  # [::1] has no port to strip
+                host = host.rsplit(":", 1)[0]
+            base = f"{scope.get('scheme', 'http')}://{host}:{self.writer_port}"
+        query = scope.get("query_string", b"").decode("latin-1")
+        return base + scope["path"] + ("?" + query if query else "")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"] in READ_METHODS
+                                       and not scope["path"].startswith(WRITER_READ_PATHS)):
+            await self.app(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": 307,
+                    "headers": [(b"location", self._location(scope).encode("latin-1")),
+                                (b"content-length", b"0")]})
+        await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,81 @@
+"""
+Request gate
+Counts in-flight HTTP requests so the database can be swapped safely: a swap
+closes the gate (new requests wait instead of failing), waits for running
+requests to drain, then reopens it on the new connection.
+"""
+
+import asyncio
+import time
+
+
+class RequestGate:
+    def __init__(self, exempt_paths=()):
+        self.exempt_paths = tuple(exempt_paths)
+        self.active = 0
+        self.waiting = 0
+        self._open = asyncio.Event()
+        self._open.set()
+        self._drained = asyncio.Event()
+        self._keep = 0
+        self.closed_since = None
+
+    async def enter(self):
+        if not self._open.is_set():
+            self.waiting += 1
+            try:
+                await self._open.wait()
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self._drained.clear()
+
+    def leave(self):
+        self.active -= 1
+        if self.active <= self._keep:
+            self._drained.set()
+
+    async def close_and_drain(self, timeout, keep=1):
+        """Hold new requests and wait until only `keep` requests (the caller) are running
+
+        Returns False (with the gate reopened) if running requests did not finish in time.
+        """
+        self._open.clear()
+        self.closed_since = time.time()
+        self._keep = keep
+        if self.active <= keep:
+            return True
+        self._drained.clear()
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.reopen()
+            return False
+
+    def reopen(self):
+        self._keep = 0
+        self.closed_since = None
+        self._open.set()
+
+    @property
+    def is_open(self):
+        return self._open.is_set()
+
+
+class RequestGateMiddleware:
+    """ASGI middleware; wraps the whole response, so streamed bodies count as in flight too"""
+
+    def __init__(self, app, gate):
+        self.app = app
+        self.gate = gate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.gate.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+        await self.gate.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.gate.leave()
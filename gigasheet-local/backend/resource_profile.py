@@ -0,0 +1,203 @@
+"""
+DuckDB resource profile
+Sizes DuckDB for the machine it actually runs in: the container's CPU quota
+and memory limit (cgroup v2 or v1) rather than the host's core count and RAM,
+and free space on the temp directory's disk. Values from a JSON config file
+and GIGASHEET_* environment variables override what is detected, and every
+connection the server opens gets the same settings through apply().
+
+    GIGASHEET_THREADS=4 GIGASHEET_MEMORY_LIMIT=5GB GIGASHEET_MAX_TEMP_SIZE=50GB
+    GIGASHEET_MEMORY_FRACTION=0.6 GIGASHEET_RESOURCE_CONFIG=/path/to/profile.json
+"""
+
+import json
+import math
+import os
+import shutil
+
+# Share of the memory limit given to DuckDB; the rest is for pandas (Excel
+# reads and merges), the Python process and the OS page cache
+DEFAULT_MEMORY_FRACTION = 0.6
+# Share of the temp directory's free disk DuckDB may fill with spill files
+DEFAULT_TEMP_DISK_FRACTION = 0.5
+MIN_MEMORY_LIMIT_BYTES = 256 * 1024**2
+# cgroup v1 reports "no limit" as a huge page-aligned number
+UNLIMITED_BYTES = 1 << 60
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+_UNITS = {"": 1, "b": 1, "kb": 1000, "mb": 1000**2, "gb": 1000**3, "tb": 1000**4,
+          "kib": 1024, "mib": 1024**2, "gib": 1024**3, "tib": 1024**4}
+
+
+def parse_size(value):
+    """24GB / '512 MiB' / 1073741824 -> bytes"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().lower().replace(" ", "")
+    number = text.rstrip("abcdefghijklmnopqrstuvwxyz")
+    unit = text[len(number):]
+    if unit not in _UNITS or not number:
+        raise ValueError(f"Invalid size '{value}' (use e.g. 512MB, 6GB, 2GiB)")
+    return int(float(number) * _UNITS[unit])
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root=CGROUP_ROOT):
+    """CPUs allowed by the cgroup quota, or None without a quota"""
+    cpu_max = _read(os.path.join(root, "cpu.max"))  # v2: "<quota> <period>" or "max <period>"
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    for directory in ("cpu", "cpu,cpuacct"):  # v1
+        quota = _read(os.path.join(root, directory, "cpu.cfs_quota_us"))
+        period = _read(os.path.join(root, directory, "cpu.cfs_period_us"))
+        if quota and period and int(quota) > 0:
+            return int(quota) / int(period)
+    return None
+
+
+def cgroup_memory_limit(root=CGROUP_ROOT):
+    """Bytes allowed by the cgroup memory limit, or None without one"""
+    memory_max = _read(os.path.join(root, "memory.max"))  # v2
+    if memory_max is None:
+        memory_max = _read(os.path.join(root, "memory", "memory.limit_in_bytes"))  # v1
+    if not memory_max or memory_max == "max" or int(memory_max) >= UNLIMITED_BYTES:
+        return None
+    return int(memory_max)
+
+
+def available_cpus():
+    """CPUs this process may run on (affinity), falling back to the host count"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def physical_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        pass  # Windows
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except ImportError:
+        return None
+
+
+def detect(temp_dir):
+    """What the host and container allow"""
+    os.makedirs(temp_dir, exist_ok=True)
+    return {
+        "cpus": available_cpus(),
+        "cgroup_cpu_limit": cgroup_cpu_limit(),
+        "physical_memory_bytes": physical_memory(),
+        "cgroup_memory_limit_bytes": cgroup_memory_limit(),
+        "temp_disk_free_bytes": shutil.disk_usage(temp_dir).free
+    }
+
+
+class ResourceProfile:
+    def __init__(self, temp_dir, detected, overrides=None, override_sources=None):
+        overrides = overrides or {}
+        self.temp_dir = temp_dir
+        self.detected = detected
+        self.sources = {}
+
+        memory_fraction = float(overrides.get("memory_fraction", DEFAULT_MEMORY_FRACTION))
+        cpus = detected["cpus"]
+        if detected["cgroup_cpu_limit"]:
+            cpus = min(cpus, max(1, math.floor(detected["cgroup_cpu_limit"])))
+        limits = [m for m in (detected["physical_memory_bytes"], detected["cgroup_memory_limit_bytes"]) if m]
+        self.memory_available_bytes = min(limits) if limits else None
+
+        self.threads = self._pick("threads", overrides, override_sources, cpus, int)
+        detected_memory = (max(MIN_MEMORY_LIMIT_BYTES, int(self.memory_available_bytes * memory_fraction))
+                           if self.memory_available_bytes else None)
+        self.memory_limit_bytes = self._pick("memory_limit", overrides, override_sources, detected_memory, parse_size)
+        self.max_temp_bytes = self._pick("max_temp_directory_size", overrides, override_sources,
+                                         int(detected["temp_disk_free_bytes"] * DEFAULT_TEMP_DISK_FRACTION),
+                                         parse_size)
+        self.warnings = []
+        if (self.memory_limit_bytes and self.memory_available_bytes
+                and self.memory_limit_bytes > self.memory_available_bytes * 0.9):
+            self.warnings.append("memory_limit leaves under 10% of the container's memory for Python; "
+                                 "large Excel merges may be OOM-killed")
+
+    def _pick(self, name, overrides, override_sources, detected_value, convert):
+        if name in overrides:
+            self.sources[name] = (override_sources or {}).get(name, "config")
+            return convert(overrides[name])
+        self.sources[name] = "detected"
+        return detected_value
+
+    def settings(self):
+        """DuckDB settings as SET statements take them (None = leave DuckDB's default)"""
+        return {
+            "threads": self.threads,
+            "memory_limit": f"{self.memory_limit_bytes // 1000**2}MB" if self.memory_limit_bytes else None,
+            "temp_directory": self.temp_dir.replace('\\', '/'),
+            "max_temp_directory_size": f"{self.max_temp_bytes // 1000**2}MB" if self.max_temp_bytes else None
+        }
+
+    def apply(self, connection):
+        """Set the profile on a connection (every connection the server opens)"""
+        for name, value in self.settings().items():
+            if value is None:
+                continue
+            literal = value if isinstance(value, int) else "'" + value + "'"
+            try:
+                connection.execute(f"SET {name}={literal}")
+            except Exception as e:
+                if name != "max_temp_directory_size":
+                    raise
+                # Older DuckDB cannot cap the temp directory
+                print(f"[RESOURCES] {name} not supported: {str(e)}")
+        return connection
+
+    def to_dict(self):
+        return {
+            "settings": self.settings(),
+            "sources": dict(self.sources),
+            "memory_available_gb": (round(self.memory_available_bytes / (1024**3), 2)
+                                    if self.memory_available_bytes else None),
+            "detected": self.detected,
+            "warnings": self.warnings
+        }
+
+
+ENV_OVERRIDES = {
+    "threads": "GIGASHEET_THREADS",
+    "memory_limit": "GIGASHEET_MEMORY_LIMIT",
+    "max_temp_directory_size": "GIGASHEET_MAX_TEMP_SIZE",
+    "memory_fraction": "GIGASHEET_MEMORY_FRACTION"
+}
+
+
+def load_profile(temp_dir, config_path=None, environ=None):
+    """Detected profile with config-file values applied, then environment variables"""
+    environ = os.environ if environ is None else environ
+    config_path = environ.get("GIGASHEET_RESOURCE_CONFIG", config_path)
+    overrides = {}
+    sources = {}
+    if config_path and os.path.exists(config_path):
+        with open(config_path, encoding="utf-8") as f:
+            for name, value in json.load(f).items():
+                if name in ENV_OVERRIDES:
+                    overrides[name] = value
+                    sources[name] = "config"
+    for name, variable in ENV_OVERRIDES.items():
+        if environ.get(variable):
+            overrides[name] = environ[variable]
+            sources[name] = "env"
+    return ResourceProfile(temp_dir, detect(temp_dir), overrides, sources)
@@ -0,0 +1,275 @@
+"""
+Query scheduler
+Admission control in front of DuckDB. Requests that run queries belong to a
+priority class: interactive (pages, search) before export before bulk
+(ingest, merges, backups). Each class has a concurrency cap, a queue with a
+length limit and a timeout, and a memory budget: it is only admitted while
+DuckDB's pinned memory (buffer memory other than cached table data, which
+DuckDB evicts on demand) is under its share of memory_limit, so a merge is not
+started on top of an export that already fills memory. A class is never
+admitted while a higher-priority class has requests queued, and bulk jobs
+pause at checkpoints between files while interactive requests are running.
+Requests that cannot be admitted in time get HTTP 503 with Retry-After.
+"""
+
+import asyncio
+import json
+import re
+import time
+from collections import deque
+
+# memory_fraction: admitted only while DuckDB pinned memory is below this share of memory_limit
+DEFAULT_CLASSES = {
+    "interactive": {"priority": 0, "max_concurrent": 16, "max_queued": 256,
+                    "queue_timeout_seconds": 30, "memory_fraction": 1.0},
+    "export": {"priority": 1, "max_concurrent": 2, "max_queued": 16,
+               "queue_timeout_seconds": 120, "memory_fraction": 0.8},
+    "bulk": {"priority": 2, "max_concurrent": 1, "max_queued": 32,
+             "queue_timeout_seconds": 600, "memory_fraction": 0.6},
+}
+# Queued requests re-check the memory budget this often (memory falls without a release)
+RECHECK_SECONDS = 0.5
+# Longest a bulk checkpoint waits for interactive requests before carrying on anyway
+MAX_PAUSE_SECONDS = 2.0
+WAIT_SAMPLES = 512
+
+
+class SchedulerRejected(Exception):
+    def __init__(self, class_name, reason, retry_after):
+        super().__init__(f"Server busy: {class_name} {reason}")
+        self.class_name = class_name
+        self.retry_after = retry_after
+
+
+class _Class:
+    def __init__(self, name, priority, max_concurrent, max_queued, queue_timeout_seconds, memory_fraction):
+        self.name = name
+        self.priority = priority
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.memory_fraction = memory_fraction
+        self.running = 0
+        self.queue = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.memory_waits = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    def to_dict(self):
+        waits = sorted(self.waits)
+        return {
+            "priority": self.priority,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "queue_timeout_seconds": self.queue_timeout_seconds,
+            "memory_fraction": self.memory_fraction,
+            "running": self.running,
+            "queued": len(self.queue),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "memory_waits": self.memory_waits,
+            "wait_p50_seconds": round(waits[len(waits) // 2], 4) if waits else None,
+            "wait_p95_seconds": round(waits[int(len(waits) * 0.95)], 4) if waits else None,
+            "wait_max_seconds": round(waits[-1], 4) if waits else None
+        }
+
+
+class QueryScheduler:
+    """Admission is decided on the event loop; checkpoint() may be called from worker threads"""
+
+    def __init__(self, classes=None, memory_usage=None, recheck_seconds=RECHECK_SECONDS,
+                 max_pause_seconds=MAX_PAUSE_SECONDS):
+        self.classes = {name: _Class(name, **settings) for name, settings in (classes or DEFAULT_CLASSES).items()}
+        # memory_usage() -> (pinned_bytes, limit_bytes), either None when unknown
+        self.memory_usage = memory_usage
+        self.recheck_seconds = recheck_seconds
+        self.max_pause_seconds = max_pause_seconds
+        self.paused_seconds = 0.0
+        self._changed = None
+        self._loop = None
+        self._memory_sample = (0.0, None, None)
+
+    def _condition(self):
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._loop is not loop:
+            self._changed = asyncio.Condition()
+            self._loop = loop
+        return self._changed
+
+    def _read_memory(self):
+        """(used_bytes, limit_bytes), re-read at most every half recheck interval"""
+        sampled_at, used, limit = self._memory_sample
+        if self.memory_usage is None or time.perf_counter() - sampled_at < self.recheck_seconds / 2:
+            return used, limit
+        try:
+            used, limit = self.memory_usage()
+        except Exception:
+            used, limit = None, None  # never block on a failed reading
+        self._memory_sample = (time.perf_counter(), used, limit)
+        return used, limit
+
+    def _memory_ok(self, cls):
+        if cls.memory_fraction >= 1.0:
+            return True
+        used, limit = self._read_memory()
+        return not (used and limit) or used < limit * cls.memory_fraction
+
+    def _blocked_by(self, cls, ticket):
+        """Why the request cannot start now, or None if it can"""
+        if cls.queue and cls.queue[0] is not ticket:
+            return "turn"  # first come, first served within a class
+        if cls.running >= cls.max_concurrent:
+            return "concurrency"
+        if any(other.queue for other in self.classes.values() if other.priority < cls.priority):
+            return "priority"
+        if not self._memory_ok(cls):
+            return "memory"
+        return None
+
+    async def acquire(self, class_name):
+        """Wait for a slot; raises SchedulerRejected when the queue is full or the wait times out"""
+        cls = self.classes[class_name]
+        started = time.perf_counter()
+        ticket = object()
+        if not cls.queue and self._blocked_by(cls, ticket) is None:
+            return self._admit(cls, started)
+        if len(cls.queue) >= cls.max_queued:
+            cls.rejected += 1
+            raise SchedulerRejected(class_name, f"queue is full ({cls.max_queued} waiting)",
+                                    retry_after=max(1, int(self.recheck_seconds * 4)))
+        changed = self._condition()
+        cls.queue.append(ticket)
+        deadline = started + cls.queue_timeout_seconds
+        waited_for_memory = False
+        try:
+            async with changed:
+                while (reason := self._blocked_by(cls, ticket)) is not None:
+                    if reason == "memory" and not waited_for_memory:
+                        cls.memory_waits += 1
+                        waited_for_memory = True
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        cls.timed_out += 1
+                        raise SchedulerRejected(class_name, f"queue wait over {cls.queue_timeout_seconds}s "
+                                                f"(waiting on {reason})",
+                                                retry_after=max(1, int(cls.queue_timeout_seconds)))
+                    try:
+                        await asyncio.wait_for(changed.wait(), min(remaining, self.recheck_seconds))
+                    except asyncio.TimeoutError:
+                        pass
+                cls.queue.remove(ticket)
+                return self._admit(cls, started)
+        finally:
+            if ticket in cls.queue:
+                cls.queue.remove(ticket)
+            await self._notify()  # the next in line is now first
+
+    def _admit(self, cls, started):
+        cls.running += 1
+        cls.admitted += 1
+        waited = time.perf_counter() - started
+        cls.waits.append(waited)
+        return waited
+
+    async def release(self, class_name):
+        self.classes[class_name].running -= 1
+        await self._notify()
+
+    async def _notify(self):
+        changed = self._condition()
+        async with changed:
+            changed.notify_all()
+
+    def checkpoint(self, class_name):
+        """Between steps of a long job: wait (bounded) while higher-priority work is running or queued"""
+        priority = self.classes[class_name].priority
+        started = time.perf_counter()
+        while time.perf_counter() - started < self.max_pause_seconds:
+            if not any(other.running or other.queue
+                       for other in self.classes.values() if other.priority < priority):
+                break
+            time.sleep(0.05)
+        paused = time.perf_counter() - started
+        self.paused_seconds += paused
+        return paused
+
+    def running(self, class_name):
+        return self.classes[class_name].running
+
+    def queued(self, class_name):
+        return len(self.classes[class_name].queue)
+
+    def status(self):
+        used, limit = self._read_memory()
+        return {
+            "classes": {name: cls.to_dict() for name, cls in sorted(self.classes.items(),
+                                                                      key=lambda item: item[1].priority)},
+            "memory_pinned_bytes": used,
+            "memory_limit_bytes": limit,
+            "checkpoint_paused_seconds": round(self.paused_seconds, 3)
+        }
+
+
+def load_classes(config_path=None):
+    """DEFAULT_CLASSES with per-class overrides from a JSON file ({"bulk": {"max_concurrent": 2}})"""
+    classes = {name: dict(settings) for name, settings in DEFAULT_CLASSES.items()}
+    if config_path:
+        try:
+            with open(config_path, encoding="utf-8") as f:
+                overrides = json.load(f)
+        except FileNotFoundError:
+            return classes
+        for name, settings in overrides.items():
+            if name not in classes:
+                raise ValueError(f"Unknown scheduler class '{name}' in {config_path}")
+            unknown = set(settings) - set(classes[name])
+            if unknown:
+                raise ValueError(f"Unknown scheduler setting(s) for '{name}': {sorted(unknown)}")
+            classes[name].update(settings)
+    return classes
+
+
+class SchedulerMiddleware:
+    """ASGI middleware: holds a class slot for the whole response (streamed bodies included)
+
+    routes: [(method, path_regex, class_name)] or (method, path_regex, class_name, query_regex)
+    for a route that is only scheduled when its query string matches; unmatched requests
+    are not scheduled.
+    """
+
+    def __init__(self, app, scheduler, routes):
+        self.app = app
+        self.scheduler = scheduler
+        self.routes = [(route[0], re.compile(route[1]), route[2], re.compile(route[3]) if len(route) > 3 else None)
+                       for route in routes]
+
+    def classify(self, method, path, query=""):
+        for route_method, pattern, class_name, query_pattern in self.routes:
+            if route_method == method and pattern.match(path) and (query_pattern is None
+                                                                   or query_pattern.search(query)):
+                return class_name
+        return None
+
+    async def __call__(self, scope, receive, send):
+        class_name = (self.classify(scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"))
+                      if scope["type"] == "http" else None)
+        if class_name is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.scheduler.acquire(class_name)
+        except SchedulerRejected as e:
+            body = json.dumps({"detail": str(e)}).encode()
+            await send({"type": "http.response.start", "status": 503,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode()),
+                                    (b"retry-after", str(e.retry_after).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await self.scheduler.release(class_name)
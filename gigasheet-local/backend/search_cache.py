@@ -0,0 +1,146 @@
+"""
+Search session cache
+Keeps the matching row ids of recent searches per (table, query, searched
+columns, version). When a new query extends a cached one over the same
+columns (Mum -> Mumb) its matches are a subset of the cached ids, so only
+those rows need to be re-checked.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SearchSession:
+    def __init__(self, table_name, query, columns, version, row_ids):
+        self.table_name = table_name
+        self.query = query
+        self.columns = columns
+        self.version = version
+        self.row_ids = row_ids  # sorted np.int64 array of DuckDB rowids
+        self.created = time.time()
+        self.last_access = self.created
+        self.hits = 0
+
+
+class SearchSessionCache:
+    def __init__(self, max_sessions=256, max_total_ids=50_000_000,
+                 max_ids_per_session=5_000_000, idle_timeout_seconds=600):
+        self.max_sessions = max_sessions
+        self.max_total_ids = max_total_ids
+        self.max_ids_per_session = max_ids_per_session
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self._sessions = OrderedDict()
+        self._total_ids = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.refinements = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _key(table_name, query, columns, version):
+        # Search uses ILIKE, so queries differing only in case share results
+        return (table_name, query.lower(), tuple(sorted(columns)), version)
+
+    def get(self, table_name, query, columns, version):
+        """Return the cached session for exactly this query over these columns, or None"""
+        key = self._key(table_name, query, columns, version)
+        with self._lock:
+            self._expire_idle()
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            self._sessions.move_to_end(key)
+            session.last_access = time.time()
+            session.hits += 1
+            self.hits += 1
+            return session
+
+    def find_base(self, table_name, query, columns, version):
+        """Return the most selective cached session whose matches contain this query's matches"""
+        needle = query.lower()
+        searched = tuple(sorted(columns))
+        best = None
+        with self._lock:
+            self._expire_idle()
+            for (t, q, c, v), session in self._sessions.items():
+                # Only a search over the same columns is a superset
+                if t != table_name or c != searched or v != version or q not in needle:
+                    continue
+                if best is None or len(session.row_ids) < len(best.row_ids):
+                    best = session
+            if best is not None:
+                self._sessions.move_to_end(self._key(table_name, best.query, columns, version))
+                best.last_access = time.time()
+                self.refinements += 1
+            else:
+                self.misses += 1
+        return best
+
+    def put(self, table_name, query, columns, version, row_ids):
+        """Cache matching row ids; returns the session or None if the set is too large"""
+        if len(row_ids) > self.max_ids_per_session:
+            return None
+        session = SearchSession(table_name, query, list(columns), version, np.asarray(row_ids, dtype=np.int64))
+        key = self._key(table_name, query, columns, version)
+        with self._lock:
+            old = self._sessions.pop(key, None)
+            if old is not None:
+                self._total_ids -= len(old.row_ids)
+            self._sessions[key] = session
+            self._total_ids += len(session.row_ids)
+            while self._sessions and (len(self._sessions) > self.max_sessions
+                                      or self._total_ids > self.max_total_ids):
+                _, evicted = self._sessions.popitem(last=False)
+                self._total_ids -= len(evicted.row_ids)
+                self.evictions += 1
+        return session
+
+    def invalidate(self, table_name=None):
+        """Drop cached sessions for one table (or all tables)"""
+        with self._lock:
+            for key in list(self._sessions):
+                if table_name is None or key[0] == table_name:
+                    self._total_ids -= len(self._sessions.pop(key).row_ids)
+
+    def _expire_idle(self):
+        cutoff = time.time() - self.idle_timeout_seconds
+        for key in list(self._sessions):
+            session = self._sessions[key]
+            if session.last_access < cutoff:
+                del self._sessions[key]
+                self._total_ids -= len(session.row_ids)
+                self.expirations += 1
+
+    def stats(self):
+        with self._lock:
+            self._expire_idle()
+            lookups = self.hits + self.refinements + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "cached_row_ids": self._total_ids,
+                "hits": self.hits,
+                "refinements": self.refinements,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.refinements) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "max_sessions": self.max_sessions,
+                "idle_timeout_seconds": self.idle_timeout_seconds,
+                "active": [
+                    {
+                        "table_name": s.table_name,
+                        "query": s.query,
+                        "columns": s.columns,
+                        "version": s.version,
+                        "matches": len(s.row_ids),
+                        "hits": s.hits,
+                        "idle_seconds": round(time.time() - s.last_access, 1)
+                    }
+                    for s in reversed(self._sessions.values())
+                ][:20]
+            }
@@ -0,0 +1,110 @@
+"""
+Multi-worker server
+One uvicorn process serializes every response through one Python interpreter.
+With --workers N this starts a writer process (uploads, merges, exports,
+backups and restores) on --writer-port, and N uvicorn reader workers on --port
+that serve pages and search from read-only snapshots the writer publishes
+after each write (see replicas.py). Readers redirect writes to the writer.
+
+    python serve.py                      # one process, same as python main.py
+    python serve.py --workers 4          # readers on :8000, writer on :8001
+
+DuckDB memory is split between the processes (GIGASHEET_MEMORY_FRACTION)
+unless GIGASHEET_MEMORY_LIMIT or GIGASHEET_MEMORY_FRACTION is set.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+from resource_profile import DEFAULT_MEMORY_FRACTION
+from spill_monitor import READER_DIR_PREFIX
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _uvicorn(host, port, workers=1):
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port)]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    return command
+
+
+def process_env(role, processes, writer_port):
+    env = dict(os.environ, GIGASHEET_ROLE=role, GIGASHEET_WRITER_PORT=str(writer_port))
+    if not env.get("GIGASHEET_MEMORY_LIMIT") and not env.get("GIGASHEET_MEMORY_FRACTION"):
+        # Every process sizes DuckDB from the same machine; give each its share
+        env["GIGASHEET_MEMORY_FRACTION"] = str(round(DEFAULT_MEMORY_FRACTION / processes, 4))
+    return env
+
+
+def remove_stale_reader_files(data_dir):
+    """Private fuzzy indexes and spill directories of readers that did not shut down cleanly"""
+    for path in glob.glob(os.path.join(data_dir, "indexes", "fuzzy_index.reader_*.duckdb*")):
+        os.remove(path)
+    for path in glob.glob(os.path.join(data_dir, "temp_duckdb", READER_DIR_PREFIX + "*")):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def serve(host="localhost", port=8000, workers=0, writer_port=None):
+    if workers < 1:
+        import uvicorn
+        uvicorn.run("main:app", host=host, port=port)
+        return 0
+
+    writer_port = writer_port or port + 1
+    data_dir = os.environ.get("GIGASHEET_DATA_DIR", BACKEND_DIR)
+    remove_stale_reader_files(data_dir)
+    processes = [
+        ("writer", subprocess.Popen(_uvicorn(host, writer_port), cwd=BACKEND_DIR,
+                                    env=process_env("writer", workers + 1, writer_port))),
+        # Readers wait in their startup for the writer's first snapshot
+        ("readers", subprocess.Popen(_uvicorn(host, port, workers), cwd=BACKEND_DIR,
+                                     env=process_env("reader", workers + 1, writer_port)))
+    ]
+    print(f"[SERVE] Writer at http://{host}:{writer_port}, {workers} read workers at http://{host}:{port}")
+
+    exit_code = 0
+    try:
+        # Run until either side exits; then take the other one down too
+        while all(process.poll() is None for _, process in processes):
+            time.sleep(0.5)
+        for name, process in processes:
+            if process.poll() is not None:
+                exit_code = process.returncode
+                print(f"[SERVE] {name} exited with code {process.returncode}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for _, process in processes:
+            if process.poll() is None:
+                if os.name == "nt":
+                    process.terminate()
+                else:
+                    process.send_signal(signal.SIGINT)  # uvicorn shuts down gracefully (lifespan cleanup)
+        for _, process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return exit_code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Gigasheet backend")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000, help="Port clients use")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Read workers; 0 runs one process that does everything")
+    parser.add_argument("--writer-port", type=int, help="Writer process port (default: --port + 1)")
+    args = parser.parse_args(argv)
+    return serve(args.host, args.port, args.workers, args.writer_port)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
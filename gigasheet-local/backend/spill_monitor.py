@@ -0,0 +1,188 @@
+"""
+DuckDB memory and spill monitor
+Reads buffer-manager usage per component (duckdb_memory()) and the temp files
+DuckDB is spilling to, counts queries whose profile shows temp-directory use,
+and at startup removes spill files left behind by a process that crashed.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+# Spill files still being written are never this old; anything older found at
+# startup belongs to a process that died without cleaning up
+ORPHAN_MIN_AGE_SECONDS = 300
+# temp_dir/<prefix><pid>: a read worker's own spill directory
+READER_DIR_PREFIX = "reader_"
+# duckdb_memory() tags for blocks cached from the database file: the buffer manager
+# evicts them whenever it needs room, so they do not count against admission
+CACHE_TAGS = frozenset({"BASE_TABLE", "METADATA", "EXTERNAL_FILE_CACHE"})
+
+
+def temp_directory_usage(path):
+    """(bytes, files) of everything under path"""
+    total_bytes = 0
+    files = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total_bytes += os.path.getsize(os.path.join(root, name))
+                files += 1
+            except OSError:
+                pass  # removed while walking
+    return total_bytes, files
+
+
+def _size_to_bytes(text):
+    """'190.7 MiB' / '24.0 GB' (current_setting output) -> bytes"""
+    units = {"bytes": 1, "b": 1, "kb": 1000, "kib": 1024, "mb": 1000**2, "mib": 1024**2,
+             "gb": 1000**3, "gib": 1024**3, "tb": 1000**4, "tib": 1024**4}
+    try:
+        number, unit = str(text).split()
+        return int(float(number) * units[unit.lower()])
+    except (ValueError, KeyError):
+        return None
+
+
+class SpillMonitor:
+    def __init__(self, temp_dir, recent=100):
+        self.temp_dir = temp_dir
+        self.spilling_queries = 0
+        self.spilled_bytes = 0
+        self.peak_temp_bytes = 0
+        self.last_sweep = None
+        self._recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    def observe_profile(self, source, sql, seconds, profile):
+        """Query log listener: record the statement if it used the temp directory"""
+        peak_temp_bytes = profile.get("system_peak_temp_dir_size")
+        if peak_temp_bytes:
+            self.record(source, sql, seconds, peak_temp_bytes, profile.get("system_peak_buffer_memory"))
+        return peak_temp_bytes
+
+    def record(self, source, sql, seconds, peak_temp_bytes, peak_buffer_bytes):
+        with self._lock:
+            self.spilling_queries += 1
+            self.spilled_bytes += peak_temp_bytes
+            self.peak_temp_bytes = max(self.peak_temp_bytes, peak_temp_bytes)
+            self._recent.append({
+                "timestamp": time.time(),
+                "source": source,
+                "seconds": round(seconds, 4),
+                "peak_temp_mb": round(peak_temp_bytes / (1024**2), 2),
+                "peak_buffer_mb": round(peak_buffer_bytes / (1024**2), 2) if peak_buffer_bytes else None,
+                "sql": " ".join(sql.split())[:500]
+            })
+        print(f"[SPILL] {source or 'query'} spilled {peak_temp_bytes / (1024**2):.1f} MB to {self.temp_dir}")
+
+    def recent_spills(self):
+        with self._lock:
+            return list(reversed(self._recent))
+
+    @staticmethod
+    def memory_by_component(conn):
+        """{component: {"memory_bytes", "temporary_bytes"}} from the buffer manager, or None on old DuckDB"""
+        cursor = conn.cursor()
+        try:
+            rows = cursor.execute(
+                "SELECT tag, memory_usage_bytes, temporary_storage_bytes FROM duckdb_memory()"
+            ).fetchall()
+        except Exception:
+            return None
+        finally:
+            cursor.close()
+        return {tag: {"memory_bytes": memory, "temporary_bytes": temporary} for tag, memory, temporary in rows}
+
+    @staticmethod
+    def pinned_memory(components):
+        """Bytes of memory_by_component() the buffer manager cannot free by evicting cached table data"""
+        return sum(usage["memory_bytes"] for tag, usage in components.items() if tag not in CACHE_TAGS)
+
+    @staticmethod
+    def limits(conn):
+        cursor = conn.cursor()
+        try:
+            memory_limit, max_temp = cursor.execute(
+                "SELECT current_setting('memory_limit'), current_setting('max_temp_directory_size')"
+            ).fetchone()
+        except Exception:
+            return {"memory_limit_bytes": None, "max_temp_directory_bytes": None}
+        finally:
+            cursor.close()
+        return {"memory_limit_bytes": _size_to_bytes(memory_limit),
+                "max_temp_directory_bytes": _size_to_bytes(max_temp)}
+
+    @staticmethod
+    def temp_files(conn):
+        """Temp files DuckDB currently holds open ([] on versions without duckdb_temporary_files())"""
+        cursor = conn.cursor()
+        try:
+            return [{"path": path, "bytes": size}
+                    for path, size in cursor.execute("SELECT path, size FROM duckdb_temporary_files()").fetchall()]
+        except Exception:
+            return []
+        finally:
+            cursor.close()
+
+    def sweep(self, min_age_seconds=ORPHAN_MIN_AGE_SECONDS):
+        """Remove spill files older than min_age_seconds (run at startup, before queries spill)"""
+        removed_files = 0
+        removed_bytes = 0
+        cutoff = time.time() - min_age_seconds
+        for root, directories, names in os.walk(self.temp_dir):
+            if root == self.temp_dir:
+                # Spill directories of read workers (serve.py) belong to running processes;
+                # serve.py removes those of readers that died before it starts new ones
+                directories[:] = [d for d in directories if not d.startswith(READER_DIR_PREFIX)]
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    os.remove(path)
+                    removed_files += 1
+                    removed_bytes += stat.st_size
+                except OSError as e:
+                    print(f"[SPILL] Could not remove {path}: {str(e)}")
+        self.last_sweep = {"timestamp": time.time(), "removed_files": removed_files,
+                           "removed_mb": round(removed_bytes / (1024**2), 2)}
+        if removed_files:
+            print(f"[SPILL] Removed {removed_files} orphaned temp file(s), {removed_bytes / (1024**2):.1f} MB")
+        return self.last_sweep
+
+    def status(self, conn):
+        temp_bytes, temp_file_count = temp_directory_usage(self.temp_dir)
+        components = self.memory_by_component(conn)
+        limits = self.limits(conn)
+        used = sum(c["memory_bytes"] for c in components.values()) if components else None
+        pinned = self.pinned_memory(components) if components else None
+        with self._lock:
+            spills = {
+                "spilling_queries": self.spilling_queries,
+                "spilled_mb_total": round(self.spilled_bytes / (1024**2), 2),
+                "peak_query_temp_mb": round(self.peak_temp_bytes / (1024**2), 2)
+            }
+        return {
+            "memory": {
+                "used_bytes": used,
+                "pinned_bytes": pinned,
+                "limit_bytes": limits["memory_limit_bytes"],
+                "used_percent_of_limit": (round(used / limits["memory_limit_bytes"] * 100, 1)
+                                          if used is not None and limits["memory_limit_bytes"] else None),
+                "by_component": {tag: usage for tag, usage in (components or {}).items()
+                                 if usage["memory_bytes"] or usage["temporary_bytes"]}
+            },
+            "temp_directory": {
+                "path": self.temp_dir,
+                "bytes": temp_bytes,
+                "files": temp_file_count,
+                "max_bytes": limits["max_temp_directory_bytes"],
+                "open_temp_files": self.temp_files(conn)
+            },
+            "spills": spills,
+            "recent_spills": self.recent_spills(),
+            "startup_sweep": self.last_sweep
+        }
@@ -0,0 +1,48 @@
+"""
+Startup timing
+Breaks server boot into phases - module imports, opening the database,
+reading catalog stats, starting the monitor - so a slow restart shows where
+the time went (printed at startup and served at GET /system/startup).
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self._last = self.started
+        self.phases = []
+        self.ready_seconds = None
+
+    def mark(self, name):
+        """Close a phase that began at the previous mark (or at creation)"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.phases.append((name, now - start))
+            self._last = now
+
+    def finish(self):
+        self.ready_seconds = time.perf_counter() - self.started
+        return self.ready_seconds
+
+    def summary(self):
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases)
+
+    def report(self):
+        return {
+            "started_at": self.started_at,
+            "ready_seconds": round(self.ready_seconds, 4) if self.ready_seconds is not None else None,
+            "phases": [{"phase": name, "seconds": round(seconds, 4)} for name, seconds in self.phases]
+        }
@@ -2,74 +2,191 @@
 """
 🚀 BILLION-ROW System Monitor
 Monitors system resources during massive data processing
+
+A background sampler thread records CPU, memory, disk and network rates and
+DuckDB temp-file usage at a fixed interval into a ring buffer, so status
+calls read the latest sample instead of blocking on a measurement.
 """
 
+import os
 import psutil
+import threading
 import time
 import json
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 
+SAMPLE_INTERVAL_SECONDS = 1.0
+HISTORY_SAMPLES = 3600  # one hour at the default interval
+
+# Fields of each sample, in the order /system/history returns them
+SAMPLE_FIELDS = (
+    "timestamp", "cpu_percent", "memory_used_gb", "memory_percent", "process_rss_gb",
+    "disk_read_mb_per_sec", "disk_write_mb_per_sec", "net_sent_mb_per_sec", "net_recv_mb_per_sec",
+    "duckdb_temp_gb"
+)
+
+def directory_size_bytes(path):
+    """Total size of the files under path (0 if it does not exist)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # spill file removed while walking
+    return total
+
 class SystemMonitor:
-    def __init__(self):
+    def __init__(self, interval_seconds=SAMPLE_INTERVAL_SECONDS, history_samples=HISTORY_SAMPLES):
         self.start_time = time.time()
         self.peak_memory = 0
         self.peak_cpu = 0
+        self.peak_temp = 0
         self.total_disk_read = 0
         self.total_disk_write = 0
         self.log_file = "system_performance.log"
+        self.interval_seconds = interval_seconds
+        self.temp_dir = None
+        self._samples = deque(maxlen=history_samples)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._process = psutil.Process()
+        self._last_counters = None
+        self.capacity_estimator = None  # set by the app (capacity.CapacityEstimator)
+    
+    def start(self, temp_dir=None):
+        """Start the background sampler (idempotent); temp_dir is DuckDB's spill directory"""
+        self.temp_dir = temp_dir
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # Prime the counters so the first sample has rates and a CPU percentage
+        psutil.cpu_percent(interval=None)
+        self._last_counters = self._read_counters()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds * 2)
+            self._thread = None
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"[MONITOR] Sample failed: {str(e)}")
+    
+    @staticmethod
+    def _read_counters():
+        return time.monotonic(), psutil.disk_io_counters(), psutil.net_io_counters()
+    
+    def sample(self):
+        """Take one sample and append it to the history (called by the sampler thread)"""
+        counters = self._read_counters()
+        last, self._last_counters = self._last_counters, counters
+        elapsed = counters[0] - last[0] if last else 0
+        
+        def rate(current, previous, field):
+            if not elapsed or current is None or previous is None:
+                return 0.0
+            return max(0, getattr(current, field) - getattr(previous, field)) / elapsed / (1024**2)
+        
+        memory = psutil.virtual_memory()
+        sample = {
+            "timestamp": round(time.time(), 3),
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_used_gb": round(memory.used / (1024**3), 3),
+            "memory_percent": memory.percent,
+            "memory_available_gb": round(memory.available / (1024**3), 3),
+            "process_rss_gb": round(self._process.memory_info().rss / (1024**3), 3),
+            "disk_read_mb_per_sec": round(rate(counters[1], last and last[1], "read_bytes"), 3),
+            "disk_write_mb_per_sec": round(rate(counters[1], last and last[1], "write_bytes"), 3),
+            "net_sent_mb_per_sec": round(rate(counters[2], last and last[2], "bytes_sent"), 3),
+            "net_recv_mb_per_sec": round(rate(counters[2], last and last[2], "bytes_recv"), 3),
+            "duckdb_temp_gb": round(directory_size_bytes(self.temp_dir) / (1024**3), 3) if self.temp_dir else 0.0,
+            "disk_io": counters[1],
+            "net_io": counters[2]
+        }
+        with self._lock:
+            self._samples.append(sample)
+            self.peak_memory = max(self.peak_memory, sample["memory_used_gb"])
+            self.peak_cpu = max(self.peak_cpu, sample["cpu_percent"])
+            self.peak_temp = max(self.peak_temp, sample["duckdb_temp_gb"])
+        return sample
+    
+    def latest(self):
+        """Most recent sample, taking one now (without blocking on CPU) if the sampler has none yet"""
+        with self._lock:
+            if self._samples:
+                return self._samples[-1]
+        if self._last_counters is None:
+            psutil.cpu_percent(interval=None)
+            self._last_counters = self._read_counters()
+        return self.sample()
+    
+    def history(self, window_seconds=None, fields=SAMPLE_FIELDS):
+        """Samples of the last window_seconds as {field: [values...]} series"""
+        with self._lock:
+            samples = list(self._samples)
+        if window_seconds is not None:
+            cutoff = time.time() - window_seconds
+            samples = [s for s in samples if s["timestamp"] >= cutoff]
+        return {field: [s[field] for s in samples] for field in fields}
     
     def get_current_stats(self):
-        """Get current system resource usage"""
+        """Get current system resource usage (from the latest background sample)"""
         try:
-            # Memory stats
-            memory = psutil.virtual_memory()
-            memory_gb = memory.used / (1024**3)
-            memory_percent = memory.percent
-            
-            # CPU stats
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            cpu_count = psutil.cpu_count()
-            
-            # Disk I/O stats
-            disk_io = psutil.disk_io_counters()
-            disk_read_gb = disk_io.read_bytes / (1024**3) if disk_io else 0
-            disk_write_gb = disk_io.write_bytes / (1024**3) if disk_io else 0
+            sample = self.latest()
+            disk_io = sample["disk_io"]
+            net_io = sample["net_io"]
             
             # Available disk space
             disk_usage = psutil.disk_usage('.')
             disk_free_gb = disk_usage.free / (1024**3)
             
-            # Network stats (if needed for distributed processing)
-            net_io = psutil.net_io_counters()
-            
-            # Update peaks
-            self.peak_memory = max(self.peak_memory, memory_gb)
-            self.peak_cpu = max(self.peak_cpu, cpu_percent)
-            
             stats = {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": datetime.fromtimestamp(sample["timestamp"]).isoformat(),
                 "uptime_seconds": time.time() - self.start_time,
+                "sample_age_seconds": round(time.time() - sample["timestamp"], 3),
                 "memory": {
-                    "used_gb": round(memory_gb, 2),
-                    "used_percent": round(memory_percent, 1),
-                    "available_gb": round(memory.available / (1024**3), 2),
-                    "peak_gb": round(self.peak_memory, 2)
+                    "used_gb": round(sample["memory_used_gb"], 2),
+                    "used_percent": round(sample["memory_percent"], 1),
+                    "available_gb": round(sample["memory_available_gb"], 2),
+                    "peak_gb": round(self.peak_memory, 2),
+                    "process_rss_gb": round(sample["process_rss_gb"], 2)
                 },
                 "cpu": {
-                    "usage_percent": round(cpu_percent, 1),
-                    "core_count": cpu_count,
+                    "usage_percent": round(sample["cpu_percent"], 1),
+                    "core_count": psutil.cpu_count(),
                     "peak_percent": round(self.peak_cpu, 1)
                 },
                 "disk": {
-                    "read_gb": round(disk_read_gb, 2),
-                    "write_gb": round(disk_write_gb, 2),
+                    "read_gb": round(disk_io.read_bytes / (1024**3), 2) if disk_io else 0,
+                    "write_gb": round(disk_io.write_bytes / (1024**3), 2) if disk_io else 0,
+                    "read_mb_per_sec": sample["disk_read_mb_per_sec"],
+                    "write_mb_per_sec": sample["disk_write_mb_per_sec"],
                     "free_space_gb": round(disk_free_gb, 2)
                 },
                 "network": {
                     "bytes_sent": net_io.bytes_sent,
-                    "bytes_recv": net_io.bytes_recv
-                } if net_io else {}
+                    "bytes_recv": net_io.bytes_recv,
+                    "sent_mb_per_sec": sample["net_sent_mb_per_sec"],
+                    "recv_mb_per_sec": sample["net_recv_mb_per_sec"]
+                } if net_io else {},
+                "duckdb_temp": {
+                    "used_gb": sample["duckdb_temp_gb"],
+                    "peak_gb": round(self.peak_temp, 3)
+                }
             }
             
             return stats
@@ -103,26 +220,16 @@ class SystemMonitor:
         return warnings
     
     def estimate_processing_capacity(self, current_rows, target_rows):
-        """Estimate if system can handle target scale"""
-        stats = self.get_current_stats()
-        
-        # Rough estimates based on current usage
-        memory_ratio = target_rows / current_rows if current_rows > 0 else 1
-        estimated_memory_gb = stats["memory"]["used_gb"] * memory_ratio
-        
-        available_memory = stats["memory"]["available_gb"]
-        
-        can_handle = estimated_memory_gb < (available_memory * 0.8)  # Leave 20% buffer
-        
-        return {
-            "can_handle_target": can_handle,
-            "estimated_memory_needed_gb": round(estimated_memory_gb, 2),
-            "available_memory_gb": round(available_memory, 2),
-            "recommendation": (
-                "✅ System can handle target scale" if can_handle 
-                else "⚠️  May need more RAM or enable disk-based processing"
-            )
-        }
+        """Estimate if system can handle target scale
+
+        DuckDB streams scans and spills sorts to disk, so memory does not grow
+        with the row count; the attached CapacityEstimator predicts disk, time
+        and memory from measured throughput instead of scaling RAM linearly.
+        """
+        if self.capacity_estimator is None:
+            return {"error": "No capacity estimator attached; nothing has been measured"}
+        disk_free = psutil.disk_usage('.').free
+        return self.capacity_estimator.estimate(target_rows, disk_free_bytes=disk_free)
     
     def get_billion_row_readiness(self):
         """Check if system is ready for billion-row processing"""
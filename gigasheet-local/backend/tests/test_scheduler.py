@@ -0,0 +1,59 @@
+import asyncio
+
+import duckdb
+import pytest
+
+from scheduler import DEFAULT_CLASSES, QueryScheduler, SchedulerMiddleware, SchedulerRejected
+from spill_monitor import SpillMonitor
+
+MEMORY_LIMIT_BYTES = 200 * 1000**2
+
+
+def admit(scheduler, class_name):
+    async def run():
+        waited = await scheduler.acquire(class_name)
+        await scheduler.release(class_name)
+        return waited
+    return asyncio.run(run())
+
+
+def test_export_admitted_after_scanning_a_large_table(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "large.duckdb"))
+    conn.execute("SET memory_limit = '200MB'")
+    conn.execute("CREATE TABLE large AS SELECT range AS id, md5(range::VARCHAR) AS a, "
+                 "md5((range + 1)::VARCHAR) AS b FROM range(8000000)")
+    conn.execute("CHECKPOINT")
+    conn.execute("SELECT count(*) FROM large WHERE a ILIKE '%abc%' OR b ILIKE '%abc%'").fetchall()
+
+    # The scan leaves the table cached past the export budget...
+    components = SpillMonitor.memory_by_component(conn)
+    assert components["BASE_TABLE"]["memory_bytes"] > MEMORY_LIMIT_BYTES * DEFAULT_CLASSES["export"]["memory_fraction"]
+
+    # ...which must not hold back exports or bulk jobs on an idle server
+    scheduler = QueryScheduler(memory_usage=lambda: (
+        SpillMonitor.pinned_memory(SpillMonitor.memory_by_component(conn)), MEMORY_LIMIT_BYTES))
+    scheduler.classes["export"].queue_timeout_seconds = 2
+    scheduler.classes["bulk"].queue_timeout_seconds = 2
+    assert admit(scheduler, "export") < 1
+    assert admit(scheduler, "bulk") < 1
+    assert scheduler.classes["export"].memory_waits == 0
+    conn.close()
+
+
+def test_pinned_memory_over_budget_holds_back_bulk_jobs():
+    scheduler = QueryScheduler(memory_usage=lambda: (int(MEMORY_LIMIT_BYTES * 0.7), MEMORY_LIMIT_BYTES),
+                               recheck_seconds=0.05)
+    scheduler.classes["bulk"].queue_timeout_seconds = 0.2
+    with pytest.raises(SchedulerRejected, match="waiting on memory"):
+        admit(scheduler, "bulk")
+    assert admit(scheduler, "export") < 1
+
+
+def test_route_scheduled_only_when_query_matches():
+    middleware = SchedulerMiddleware(None, QueryScheduler(), [
+        ("GET", r"^/system/billion-row-check$", "bulk", r"(^|&)benchmark_rows=0*[1-9]"),
+    ])
+    assert middleware.classify("GET", "/system/billion-row-check", "benchmark_rows=1000000") == "bulk"
+    assert middleware.classify("GET", "/system/billion-row-check", "x=1&benchmark_rows=05") == "bulk"
+    assert middleware.classify("GET", "/system/billion-row-check", "benchmark_rows=0") is None
+    assert middleware.classify("GET", "/system/billion-row-check") is None
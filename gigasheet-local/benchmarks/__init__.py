@@ -0,0 +1,8 @@
+"""
+Gigasheet benchmarks
+Deterministic synthetic workbooks/CSVs (generator.py) and scenario timings
+against the real FastAPI app, run in-process on a scratch data directory
+(run.py), with regression checks against thresholds or a baseline run.
+
+    python -m benchmarks.run --rows 20000 --output results.json
+"""
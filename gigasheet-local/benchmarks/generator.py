@@ -0,0 +1,107 @@
+"""
+Synthetic workbook / CSV generator
+Writes files that look like the exports people merge: names, emails, phone
+numbers, cities, amounts, dates and free-text notes, with a few blanks and
+non-ASCII names. Each file uses one of several schema variants - renamed,
+added, missing and reordered columns, amounts stored as text - the drift
+smart_merge_excel and /merge-all-data have to reconcile. The same seed always
+produces byte-identical data.
+"""
+
+import csv
+import os
+import random
+from datetime import date, timedelta
+
+FIRST_NAMES = ["Anna", "Ravi", "Chen", "Fatima", "Lukas", "Sofia", "Kwame", "Mei", "Diego", "Olga",
+               "José", "Zoë", "Søren", "Ayşe", "Priya", "Tomás", "Hana", "Omar", "Elena", "Yuki"]
+LAST_NAMES = ["Smith", "Patel", "Wang", "Khan", "Müller", "Rossi", "Mensah", "Li", "García", "Ivanova",
+              "Nguyen", "Kowalski", "Okafor", "Sato", "Dubois", "Silva", "Cohen", "Larsen", "Ali", "Brown"]
+CITIES = ["Berlin", "Mumbai", "Lagos", "Austin", "Osaka", "Lima", "Toronto", "Cairo",
+          "Madrid", "Jakarta", "Denver", "Seoul", "Nairobi", "Oslo", "Quito", "Dublin"]
+REGIONS = ["EMEA", "APAC", "AMER"]
+STATUSES = ["active", "pending", "closed", "refunded"]
+NOTES = ["call back", "VIP customer", "prefers email", "address changed", "duplicate?", ""]
+
+# Column lists per variant; identifiers only (the merge endpoints use headers as SQL column names)
+SCHEMA_VARIANTS = [
+    ["Name", "Email", "Phone", "City", "Amount", "Order_Date", "Status"],
+    # renamed phone column, extra notes
+    ["Name", "Email", "Phone_Number", "City", "Amount", "Order_Date", "Status", "Notes"],
+    # reordered, amount as formatted text, no status
+    ["Email", "Name", "City", "Amount_Text", "Order_Date", "Phone"],
+    # extra region, date as dd/mm/yyyy text, renamed amount
+    ["Name", "Email", "Phone", "City", "Region", "Total_Amount", "Order_Date_Text", "Status"],
+]
+
+START_DATE = date(2015, 1, 1)
+
+
+def _value(column, rng, row_number):
+    if column == "Name":
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    if column == "Email":
+        return f"user{row_number}.{rng.randrange(10**6)}@example.com"
+    if column in ("Phone", "Phone_Number"):
+        # Blank in ~5% of rows, like real contact lists
+        return None if rng.random() < 0.05 else f"+1-{rng.randrange(200, 999)}-{rng.randrange(10**7):07d}"
+    if column == "City":
+        return rng.choice(CITIES)
+    if column == "Region":
+        return rng.choice(REGIONS)
+    if column in ("Amount", "Total_Amount"):
+        return round(rng.uniform(1, 10000), 2)
+    if column == "Amount_Text":
+        return f"${rng.uniform(1, 10000):,.2f}"
+    if column == "Order_Date":
+        return START_DATE + timedelta(days=rng.randrange(3650))
+    if column == "Order_Date_Text":
+        return (START_DATE + timedelta(days=rng.randrange(3650))).strftime("%d/%m/%Y")
+    if column == "Status":
+        return rng.choice(STATUSES)
+    if column == "Notes":
+        return rng.choice(NOTES) or None
+    raise ValueError(f"Unknown column {column}")
+
+
+def generate_rows(columns, rows, seed):
+    """Yield `rows` lists of values for the given columns"""
+    rng = random.Random(seed)
+    for row_number in range(rows):
+        yield [_value(column, rng, row_number) for column in columns]
+
+
+def write_xlsx(path, columns, rows, seed):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append(columns)
+    for row in generate_rows(columns, rows, seed):
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_csv(path, columns, rows, seed):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in generate_rows(columns, rows, seed):
+            writer.writerow(["" if value is None else value for value in row])
+
+
+def generate_dataset(out_dir, files=4, rows_per_file=10000, csv_files=1, seed=42):
+    """Write `files` workbooks and `csv_files` CSVs, cycling through the schema variants
+
+    Returns a manifest: [{"path", "format", "rows", "columns"}].
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = []
+    for index in range(files + csv_files):
+        columns = SCHEMA_VARIANTS[index % len(SCHEMA_VARIANTS)]
+        is_csv = index >= files
+        path = os.path.join(out_dir, f"bench_{index:02d}.{'csv' if is_csv else 'xlsx'}")
+        (write_csv if is_csv else write_xlsx)(path, columns, rows_per_file, seed + index)
+        manifest.append({"path": path, "format": "csv" if is_csv else "xlsx",
+                         "rows": rows_per_file, "columns": columns})
+    return manifest
@@ -0,0 +1,344 @@
+"""
+Concurrent load test
+Starts the backend with uvicorn on a scratch data directory (or targets a
+running server with --url), loads a generated dataset, then runs a closed
+loop of N workers replaying a weighted mix of page, search, status and upload
+calls. A second phase repeats the mix while a merge runs continuously in the
+background, so read latency with and without a concurrent write can be
+compared. Reports p50/p95/p99 latency, throughput and error rate per
+operation and phase.
+
+    python -m benchmarks.loadtest --concurrency 16 --duration 30 \\
+        --mix page=6,search=3,status=1,upload=0.2 --output loadtest.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from benchmarks.generator import SCHEMA_VARIANTS, generate_dataset, write_csv
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+DEFAULT_MIX = "page=6,search=3,status=1,upload=0.2"
+SEARCH_TERMS = ["Berlin", "garcía", "user12", "VIP", "Patel", "refunded", "+1-5", "Osaka"]
+REQUEST_TIMEOUT_SECONDS = 300
+
+
+def parse_mix(text):
+    """'page=6,search=3' -> {"page": 6.0, "search": 3.0}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _multipart(filename, content):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: text/csv\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class LoadClient:
+    def __init__(self, base_url, table, total_rows, upload_bytes):
+        self.base_url = base_url.rstrip("/")
+        self.table = table
+        self.total_rows = total_rows
+        self.upload_bytes = upload_bytes
+
+    def request(self, method, path, params=None, body=None, content_type=None):
+        """(status, seconds); status 0 for connection errors and timeouts"""
+        url = self.base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        request = urllib.request.Request(url, data=body, method=method)
+        if content_type:
+            request.add_header("Content-Type", content_type)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        return status, time.perf_counter() - start
+
+    def page(self, rng, worker):
+        offset = rng.randrange(max(1, self.total_rows - 100))
+        return self.request("GET", f"/tables/{self.table}/data", {"offset": offset, "limit": 100})
+
+    def search(self, rng, worker):
+        return self.request("GET", f"/tables/{self.table}/search", {"query": rng.choice(SEARCH_TERMS)})
+
+    def status(self, rng, worker):
+        return self.request("GET", "/system/status")
+
+    def upload(self, rng, worker):
+        # One file (and table) per worker, so concurrent uploads never write the same path
+        body, content_type = _multipart(f"loadtest_upload_{worker}.csv", self.upload_bytes)
+        return self.request("POST", "/upload", body=body, content_type=content_type)
+
+
+OPERATIONS = ("page", "search", "status", "upload")
+
+
+class Recorder:
+    def __init__(self):
+        self._samples = []
+        self._lock = threading.Lock()
+
+    def add(self, phase, operation, status, seconds):
+        with self._lock:
+            self._samples.append((phase, operation, status, seconds))
+
+    def summary(self, durations):
+        """{phase: {operation: stats}} with latency percentiles over successful requests"""
+        with self._lock:
+            samples = list(self._samples)
+        grouped = {}
+        for phase, operation, status, seconds in samples:
+            grouped.setdefault(phase, {}).setdefault(operation, []).append((status, seconds))
+        report = {}
+        for phase, operations in grouped.items():
+            report[phase] = {}
+            for operation, results in sorted(operations.items()):
+                latencies = sorted(seconds for status, seconds in results if 200 <= status < 400)
+                errors = sum(1 for status, _ in results if not 200 <= status < 400)
+                report[phase][operation] = {
+                    "requests": len(results),
+                    "errors": errors,
+                    "error_rate": round(errors / len(results), 4),
+                    "throughput_per_second": round(len(results) / durations[phase], 2),
+                    "p50_ms": _ms(percentile(latencies, 0.50)),
+                    "p95_ms": _ms(percentile(latencies, 0.95)),
+                    "p99_ms": _ms(percentile(latencies, 0.99)),
+                    "max_ms": _ms(latencies[-1] if latencies else None),
+                    "status_codes": _count_statuses(results)
+                }
+        return report
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def _count_statuses(results):
+    counts = {}
+    for status, _ in results:
+        counts[str(status)] = counts.get(str(status), 0) + 1
+    return counts
+
+
+def run_phase(client, recorder, phase, mix, concurrency, duration, seed, background=None):
+    """Closed loop: each worker sends its next request as soon as the previous one returns"""
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+    deadline = time.perf_counter() + duration
+    stop = threading.Event()
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            status, seconds = getattr(client, operation)(rng, index)
+            recorder.add(phase, operation, status, seconds)
+
+    def writer():
+        # Merge back to back for the whole phase
+        while not stop.is_set():
+            method, path = background
+            status, seconds = client.request(method, path)
+            recorder.add(phase, "merge", status, seconds)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    if background is not None:
+        threads.append(threading.Thread(target=writer, daemon=True))
+    print(f"[LOADTEST] Phase '{phase}': {concurrency} workers for {duration}s"
+          f"{' with ' + background[1] + ' running' if background else ''}", file=sys.stderr)
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads[:concurrency]:
+        thread.join()
+    stop.set()
+    for thread in threads[concurrency:]:
+        # Let the in-flight merge finish so it does not bleed into the next phase
+        thread.join()
+    return time.perf_counter() - started
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(work_dir, app_module, port):
+    """Run the backend with uvicorn in work_dir/backend (data in work_dir/state)"""
+    app_dir = os.path.join(work_dir, "backend")
+    os.makedirs(app_dir, exist_ok=True)
+    env = dict(os.environ, GIGASHEET_DATA_DIR=os.path.join(work_dir, "state"),
+               PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    log = open(os.path.join(work_dir, "server.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{app_module}:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=app_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    return process, log
+
+
+def wait_for_server(base_url, process=None, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + "/", timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout}s")
+
+
+def prepare_data(base_url, work_dir, rows, files, seed):
+    """Generate workbooks next to the server's working directory and merge them into the read table"""
+    generate_dataset(os.path.join(work_dir, "data"), files, rows, csv_files=0, seed=seed)
+    client = LoadClient(base_url, "merged_excel_data", 0, b"")
+    status, seconds = client.request("POST", "/merge-excel")
+    if status != 200:
+        raise RuntimeError(f"Seeding merge failed with HTTP {status}")
+    print(f"[LOADTEST] Seeded merged_excel_data in {seconds:.1f}s", file=sys.stderr)
+
+
+def table_rows(base_url, table):
+    url = f"{base_url}/tables/{table}/data?" + urllib.parse.urlencode({"limit": 1})
+    with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+        return json.loads(response.read())["total_count"]
+
+
+def upload_payload(work_dir, rows, seed):
+    path = os.path.join(work_dir, "upload.csv")
+    write_csv(path, SCHEMA_VARIANTS[0], rows, seed)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Gigasheet API")
+    parser.add_argument("--url", help="Target a running server instead of starting one (data is not seeded)")
+    parser.add_argument("--app", default="main", help="Backend module to start (main or working_main)")
+    parser.add_argument("--table", default="merged_excel_data", help="Table read by page and search calls")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows per generated workbook")
+    parser.add_argument("--files", type=int, default=4, help="Workbooks to generate and merge")
+    parser.add_argument("--upload-rows", type=int, default=1000, help="Rows in the file each upload sends")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per phase")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted operations (default {DEFAULT_MIX})")
+    parser.add_argument("--merge-endpoint", default="/merge-all-data",
+                        help="Write run back to back in the 'merge' phase")
+    parser.add_argument("--no-merge-phase", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory and server log")
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    work_dir = tempfile.mkdtemp(prefix="gigasheet_load_")
+    process = log = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+            wait_for_server(base_url)
+        else:
+            port = _free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            process, log = start_server(work_dir, args.app, port)
+            wait_for_server(base_url, process)
+            prepare_data(base_url, work_dir, args.rows, args.files, args.seed)
+
+        client = LoadClient(base_url, args.table, table_rows(base_url, args.table),
+                            upload_payload(work_dir, args.upload_rows, args.seed))
+        recorder = Recorder()
+        durations = {"baseline": run_phase(client, recorder, "baseline", mix, args.concurrency,
+                                           args.duration, args.seed)}
+        if not args.no_merge_phase:
+            durations["merge"] = run_phase(client, recorder, "merge", mix, args.concurrency, args.duration,
+                                           args.seed, background=("POST", args.merge_endpoint))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+            log.close()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    phases = recorder.summary(durations)
+    results = {
+        "timestamp": time.time(),
+        "config": {"url": args.url, "app": args.app, "table": args.table, "rows": client.total_rows,
+                   "concurrency": args.concurrency, "duration_seconds": args.duration, "mix": mix,
+                   "merge_endpoint": None if args.no_merge_phase else args.merge_endpoint},
+        "phases": phases,
+        "interference": interference(phases)
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print_report(results)
+    print(f"[LOADTEST] Results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+def interference(phases):
+    """How much slower each read got while the merge ran: merge p95 / baseline p95"""
+    if "merge" not in phases:
+        return None
+    ratios = {}
+    for operation, stats in phases["baseline"].items():
+        during = phases["merge"].get(operation)
+        if during and stats["p95_ms"] and during["p95_ms"]:
+            ratios[operation] = round(during["p95_ms"] / stats["p95_ms"], 2)
+    return {"p95_slowdown": ratios}
+
+
+def print_report(results):
+    print(f"{'phase':<9} {'operation':<8} {'req':>6} {'err%':>6} {'req/s':>8} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for phase, operations in results["phases"].items():
+        for operation, stats in operations.items():
+            print(f"{phase:<9} {operation:<8} {stats['requests']:>6} {stats['error_rate'] * 100:>5.1f}% "
+                  f"{stats['throughput_per_second']:>8} {stats['p50_ms'] or '-':>9} "
+                  f"{stats['p95_ms'] or '-':>9} {stats['p99_ms'] or '-':>9}")
+    if results["interference"]:
+        print(f"p95 slowdown while merging: {results['interference']['p95_slowdown']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
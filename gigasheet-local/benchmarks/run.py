@@ -0,0 +1,212 @@
+"""
+Scenario benchmark against the real FastAPI app
+Generates a dataset, points the app at a scratch data directory
+(GIGASHEET_DATA_DIR) and working directory, imports it in-process and times
+each scenario through a TestClient: uploads, every merge endpoint the app
+has, paging at several depths, each search mode and each export format.
+Results are written as JSON; with --thresholds and/or --baseline the run
+fails (exit code 1) when a scenario errors or gets slower than allowed.
+
+    python -m benchmarks.run --rows 20000 --files 4 --output results.json \\
+        --thresholds benchmarks/thresholds.json --baseline previous.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.generator import generate_dataset
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+# Differences smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def build_scenarios(manifest):
+    """[(name, method, path, kwargs)] in run order; later scenarios read tables earlier ones create"""
+    csv_file = next(m["path"] for m in manifest if m["format"] == "csv")
+    xlsx_file = next(m["path"] for m in manifest if m["format"] == "xlsx")
+    table = "merged_excel_data"
+    search = f"/tables/{table}/search"
+    return [
+        ("upload_csv", "POST", "/upload", {"upload": csv_file}),
+        ("upload_xlsx", "POST", "/upload", {"upload": xlsx_file}),
+        ("merge_excel", "POST", "/merge-excel", {}),
+        ("smart_merge_excel", "POST", "/smart-merge-excel", {}),
+        ("merge_all_data", "POST", "/merge-all-data", {}),
+        ("page_first", "GET", f"/tables/{table}/data", {"params": {"offset": 0, "limit": 100}}),
+        ("page_middle", "GET", f"/tables/{table}/data", {"params": {"offset": "middle", "limit": 100}}),
+        ("page_last", "GET", f"/tables/{table}/data", {"params": {"offset": "last", "limit": 100}}),
+        ("page_filtered", "GET", f"/tables/{table}/data",
+         {"params": {"limit": 100, "filters": json.dumps({"City": "ber"})}}),
+        ("page_sorted", "GET", f"/tables/{table}/data", {"params": {"limit": 100, "sort_by": "Amount"}}),
+        ("search_contains", "GET", search, {"params": {"query": "garcía"}}),
+        ("search_exact", "GET", search, {"params": {"query": "Berlin", "mode": "exact"}}),
+        ("search_fuzzy", "GET", search, {"params": {"query": "Berlni", "mode": "fuzzy"}}),
+        ("search_regex", "GET", search, {"params": {"query": "^Ber.*n$", "mode": "regex"}}),
+        ("export_csv", "POST", f"/export/{table}", {"params": {"format": "csv"}}),
+        ("export_parquet", "POST", f"/export/{table}", {"params": {"format": "parquet"}}),
+        ("export_excel", "POST", f"/export/{table}", {"params": {"format": "excel", "query": "Berlin"}}),
+    ]
+
+
+def _route_exists(app, method, path):
+    from starlette.routing import Match
+
+    scope = {"type": "http", "method": method, "path": path}
+    return any(route.matches(scope)[0] == Match.FULL for route in app.routes)
+
+
+def _resolve_params(params, total_rows):
+    resolved = dict(params)
+    if resolved.get("offset") == "middle":
+        resolved["offset"] = total_rows // 2
+    elif resolved.get("offset") == "last":
+        resolved["offset"] = max(0, total_rows - resolved.get("limit", 100))
+    return resolved
+
+
+def _request(client, method, path, kwargs, total_rows):
+    if "upload" in kwargs:
+        with open(kwargs["upload"], "rb") as f:
+            return client.request(method, path, files={"file": (os.path.basename(kwargs["upload"]), f)})
+    return client.request(method, path, params=_resolve_params(kwargs.get("params", {}), total_rows))
+
+
+def run_scenarios(client, app, scenarios, repeat):
+    results = {}
+    total_rows = 0
+    for name, method, path, kwargs in scenarios:
+        if not _route_exists(app, method, path):
+            results[name] = {"skipped": f"{method} {path} not in this app"}
+            continue
+        timings = []
+        status = None
+        error = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = _request(client, method, path, kwargs, total_rows)
+            timings.append(time.perf_counter() - start)
+            status = response.status_code
+            if status >= 400:
+                error = response.text[:500]
+                break
+        if name.startswith("merge") or name == "smart_merge_excel":
+            count = client.get("/tables/merged_excel_data/data", params={"limit": 1})
+            if count.status_code == 200:
+                total_rows = count.json()["total_count"]
+        results[name] = {
+            "status": status,
+            "error": error,
+            "runs": len(timings),
+            "median_seconds": round(statistics.median(timings), 4),
+            "max_seconds": round(max(timings), 4),
+            "response_bytes": len(response.content)
+        }
+        print(f"[BENCH] {name}: {results[name]['median_seconds']:.3f}s (HTTP {status})", file=sys.stderr)
+    return results
+
+
+def run(app_module="main", rows=10000, files=4, csv_files=1, repeat=3, seed=42, work_dir=None, keep=False):
+    work_dir = work_dir or tempfile.mkdtemp(prefix="gigasheet_bench_")
+    data_dir = os.path.join(work_dir, "data")
+    app_dir = os.path.join(work_dir, "backend")
+    os.makedirs(app_dir, exist_ok=True)
+    started = time.perf_counter()
+    manifest = generate_dataset(data_dir, files, rows, csv_files, seed)
+    generate_seconds = time.perf_counter() - started
+
+    # The app resolves ../data, uploads/ and exports/ against its working directory
+    previous_cwd = os.getcwd()
+    os.environ["GIGASHEET_DATA_DIR"] = os.path.join(work_dir, "state")
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(app_dir)
+    try:
+        from fastapi.testclient import TestClient
+
+        module = importlib.import_module(app_module)
+        with TestClient(module.app) as client:
+            scenarios = run_scenarios(client, module.app, build_scenarios(manifest), repeat)
+    finally:
+        os.chdir(previous_cwd)
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "timestamp": time.time(),
+        "config": {"app": app_module, "rows_per_file": rows, "files": files, "csv_files": csv_files,
+                   "repeat": repeat, "seed": seed},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count()},
+        "generate_seconds": round(generate_seconds, 3),
+        "scenarios": scenarios
+    }
+
+
+def find_regressions(results, thresholds=None, baseline=None, tolerance=0.25):
+    """Failed scenarios, ones over their threshold, and ones slower than baseline * (1 + tolerance)"""
+    regressions = []
+    baseline_scenarios = (baseline or {}).get("scenarios", {})
+    for name, result in results["scenarios"].items():
+        if "skipped" in result:
+            continue
+        if result["error"] is not None:
+            regressions.append({"scenario": name, "reason": f"HTTP {result['status']}: {result['error'][:200]}"})
+            continue
+        limit = (thresholds or {}).get(name)
+        if isinstance(limit, (int, float)) and result["median_seconds"] > limit:
+            regressions.append({"scenario": name, "reason": f"{result['median_seconds']}s over threshold {limit}s"})
+        before = baseline_scenarios.get(name, {}).get("median_seconds")
+        if (before is not None and result["median_seconds"] > before * (1 + tolerance)
+                and result["median_seconds"] - before > MIN_REGRESSION_SECONDS):
+            regressions.append({"scenario": name,
+                                "reason": f"{result['median_seconds']}s vs baseline {before}s (+{tolerance:.0%} allowed)"})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gigasheet scenario benchmark")
+    parser.add_argument("--app", default="main", help="Backend module to benchmark (main or working_main)")
+    parser.add_argument("--rows", type=int, default=10000, help="Rows per generated file")
+    parser.add_argument("--files", type=int, default=4, help="Excel workbooks to generate")
+    parser.add_argument("--csv-files", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, choices=range(1, 101), metavar="N",
+                        help="Runs per scenario (median is reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", help="Scratch directory (default: a new temp directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--thresholds", help=f"JSON {{scenario: max_seconds}} (e.g. {DEFAULT_THRESHOLDS})")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.app, args.rows, args.files, args.csv_files, args.repeat, args.seed, args.work_dir, args.keep)
+    thresholds = None
+    if args.thresholds:
+        with open(args.thresholds, encoding="utf-8") as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    results["regressions"] = find_regressions(results, thresholds, baseline, args.tolerance)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    for regression in results["regressions"]:
+        print(f"[BENCH] REGRESSION {regression['scenario']}: {regression['reason']}", file=sys.stderr)
+    print(f"[BENCH] Results written to {args.output}", file=sys.stderr)
+    return 1 if results["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Cold-start check
+Boots the backend in fresh interpreters (nothing cached in sys.modules) in a
+scratch data directory, runs its startup through a TestClient and reports
+the median of each startup phase (see backend/startup_timing.py). Fails
+(exit code 1) when the median time to ready is over --max-seconds, or when a
+module that should only load on first use was imported during boot.
+
+    python -m benchmarks.startup --runs 5 --max-seconds 3
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+# Loaded by the first search, merge or Excel export, never by startup
+LAZY_MODULES = ["pandas", "openpyxl"]
+
+_BOOT = """
+import json, sys, time
+started = time.perf_counter()
+import {app}
+from fastapi.testclient import TestClient
+with TestClient({app}.app) as client:
+    ready = time.perf_counter() - started
+    status = client.get("/tables").status_code
+print("@@" + json.dumps({{"wall_seconds": ready, "probe": status,
+                          "startup": {app}.startup.report() if hasattr({app}, "startup") else None,
+                          "imported": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def boot_once(app_module, work_dir):
+    """Start the app in a new interpreter; its timing report"""
+    app_dir = os.path.join(work_dir, "backend")
+    os.makedirs(app_dir, exist_ok=True)
+    env = dict(os.environ, GIGASHEET_DATA_DIR=os.path.join(work_dir, "state"),
+               PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")])))
+    code = _BOOT.format(app=app_module, lazy=LAZY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], cwd=app_dir, env=env,
+                            capture_output=True, text=True, timeout=300)
+    line = next((l for l in result.stdout.splitlines() if l.startswith("@@")), None)
+    if result.returncode != 0 or line is None:
+        raise RuntimeError(f"{app_module} failed to start: {result.stderr[-2000:]}")
+    return json.loads(line[2:])
+
+
+def run(app_module="main", runs=5, work_dir=None, keep=False):
+    work_dir = work_dir or tempfile.mkdtemp(prefix="gigasheet_startup_")
+    try:
+        # The first run creates the database; later runs open an existing one, like a restart
+        boots = [boot_once(app_module, work_dir) for _ in range(runs)]
+    finally:
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    phases = {}
+    for boot in boots:
+        for phase in (boot["startup"] or {}).get("phases", []):
+            phases.setdefault(phase["phase"], []).append(phase["seconds"])
+    return {
+        "app": app_module,
+        "runs": runs,
+        "median_wall_seconds": round(statistics.median(b["wall_seconds"] for b in boots), 4),
+        "max_wall_seconds": round(max(b["wall_seconds"] for b in boots), 4),
+        "median_phase_seconds": {name: round(statistics.median(v), 4) for name, v in phases.items()},
+        "imported_at_boot": sorted({m for b in boots for m in b["imported"]}),
+        "probe_status": sorted({b["probe"] for b in boots})
+    }
+
+
+def find_problems(result, max_seconds=None):
+    problems = []
+    if result["probe_status"] != [200]:
+        problems.append(f"GET /tables returned {result['probe_status']}")
+    if max_seconds is not None and result["median_wall_seconds"] > max_seconds:
+        problems.append(f"median startup {result['median_wall_seconds']}s over {max_seconds}s")
+    if result["imported_at_boot"]:
+        problems.append(f"imported during startup: {', '.join(result['imported_at_boot'])}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gigasheet cold-start check")
+    parser.add_argument("--app", default="main", help="Backend module to start")
+    parser.add_argument("--runs", type=int, default=5, choices=range(1, 51), metavar="N")
+    parser.add_argument("--max-seconds", type=float, help="Fail when the median time to ready exceeds this")
+    parser.add_argument("--work-dir", help="Scratch directory (default: a new temp directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    parser.add_argument("--output", help="Write the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args.app, args.runs, args.work_dir, args.keep)
+    result["problems"] = find_problems(result, args.max_seconds)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    for problem in result["problems"]:
+        print(f"[STARTUP] FAIL {problem}", file=sys.stderr)
+    return 1 if result["problems"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())